@@ -3,7 +3,8 @@
 # This file is part of Pesky.  Pesky is BSD-licensed software;
 # for copyright information see the LICENSE file.
 
-from pesky.settings import Settings, ConfigureError
+from pesky.settings.settings import Settings
+from pesky.settings.errors import ConfigureError
 
 NOACTION = 'no action'
 
@@ -13,24 +14,28 @@ class ActionBase(object):
     def __init__(self):
         self.children = dict()
 
-    def _init(self, settings, options, actions):
+    def _init(self, parser, options, actions):
         for option in options:
-            settings.add(option)
+            parser.add(option)
         for action in actions:
             if not isinstance(action, Action):
                 raise TypeError("invalid action %s" % str(action))
             if action.name in self.children:
                 raise KeyError("action %s already exists" % action.name)
             self.children[action.name] = action
-            childsettings = settings.add_subcommand(action.name, action.usage, action.description)
-            action._init(childsettings, action.options, action.actions)
+            subcommand = parser.add_subcommand(action.name, aliases=action.aliases)
+            if action.usage is not None:
+                subcommand.set_usage(action.usage)
+            if action.description is not None:
+                subcommand.set_description(action.description)
+            action._init(subcommand, action.options, action.actions)
 
 class ActionMap(ActionBase):
     """
     """
-    def __init__(self, usage, version, description, section=None, appname=None, confbase='/etc/', options=None, actions=None):
+    def __init__(self, appname, appgroup, version, description, usage, options=None, actions=None):
         ActionBase.__init__(self)
-        self.settings = Settings(usage, version, description, section=section, appname=appname, confbase=confbase)
+        self.settings = Settings(appname, appgroup, version, description, usage)
         if options is None:
             self.options = list()
         else:
@@ -40,15 +45,19 @@ class ActionMap(ActionBase):
         else:
             self.actions = actions
         self.callback = None
-        self._init(self.settings, self.options, self.actions)
+        self._init(self.settings.options, self.options, self.actions)
 
-    def parse(self, *args, **kwargs):
-        ns = self.settings.parse(*args, **kwargs)
+    def parse(self):
+        """
+        Parse the settings, then call the callback of the action selected
+        by the command line.  The subcommand path has already been resolved
+        by the routing index of the option parser (including aliases and
+        prefixes), so the actions are found by their canonical names.
+        """
+        ns = self.settings.parse()
         action = self
-        name = ns.pop_stack()
-        while name is not None:
+        for name in ns.get('pesky.option.command') or []:
             action = action.children[name]
-            name = ns.pop_stack()
         callback = action.callback
         if callback is None:
             raise RuntimeError("no callback specified")
@@ -59,9 +68,13 @@ class ActionMap(ActionBase):
 class Action(ActionBase):
     """
     """
-    def __init__(self, name, callback=None, usage=None, description=None, options=None, actions=None):
+    def __init__(self, name, callback=None, usage=None, description=None, options=None, actions=None, aliases=None):
         ActionBase.__init__(self)
         self.name = name
+        if aliases is None:
+            self.aliases = list()
+        else:
+            self.aliases = aliases
         self.callback = callback
         self.usage = usage
         self.description = description
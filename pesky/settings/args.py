@@ -3,14 +3,140 @@
 # This file is part of Pesky.  Pesky is BSD-licensed software;
 # for copyright information see the LICENSE file.
 
+import re, shlex
+
 from pesky.settings.errors import ConfigureError
 
+# characters which str.split() doesn't treat the same as shlex.split()
+_special = re.compile(r'[\'"\\\x0b\x0c]')
+
+# the maximum number of raw values remembered by split()
+SPLIT_CACHE_SIZE = 256
+
+_split_cache = {}
+
+def split(string):
+    """
+    Split the string into words using shell-like syntax, with the same
+    results as shlex.split().  Strings without quotes or backslashes are
+    split on whitespace by str.split(), and only the rest are passed to the
+    much slower shlex lexer.  Results are cached per string; the cache is
+    emptied when it holds SPLIT_CACHE_SIZE strings.
+
+    :param string: The string to split.
+    :type string: str
+    :returns: The words.
+    :rtype: [str]
+    :raises ValueError: If the string contains unbalanced quotes or a
+      trailing backslash.
+    """
+    try:
+        return list(_split_cache[string])
+    except KeyError:
+        pass
+    if _special.search(string) is None:
+        words = string.split()
+    else:
+        words = shlex.split(string)
+    if len(_split_cache) >= SPLIT_CACHE_SIZE:
+        _split_cache.clear()
+    _split_cache[string] = tuple(words)
+    return words
+
+class ArgSpec(object):
+    """
+    A reusable argument specification.  The validators, arity and names are
+    bound once when the spec is created, so applying the spec to an argument
+    list does no per-call option handling.
+
+    :param spec: a list of validator functions
+    :type spec: [callable]
+    :param minimum: The number of required arguments
+    :type: int
+    :param maximum: The numer of required + optional arguments
+    :type maxmimum: int
+    :param names: a list of argument names corresponding to each validator
+    :type names: [str]
+    """
+    def __init__(self, *spec, **kwargs):
+        self.validators = tuple(spec)
+        self.minimum = kwargs.get('minimum', None)
+        self.maximum = kwargs.get('maximum', None)
+        self.names = kwargs.get('names', None)
+        if self.minimum is None:
+            self._required = len(spec)
+        else:
+            self._required = min(self.minimum, len(spec))
+        names = self.names or []
+        self._missing = []
+        self._failed = []
+        for i in range(len(spec)):
+            if i < len(names):
+                self._missing.append("missing argument " + names[i])
+                self._failed.append("failed to parse argument %s: " % names[i])
+            else:
+                self._missing.append("missing argument")
+                self._failed.append("failed to parse argument: ")
+
+    def __call__(self, args):
+        """
+        Returns a tuple containing arguments conforming to the spec.  Any
+        optional arguments which are not specified are passed through
+        unmodified.
+
+        :param args: The arguments.
+        :type args: [str]
+        :returns: a tuple containing arguments conforming to spec
+        :rtype: (object)
+        :raises ConfigureError: If the number of arguments is less than
+          minimum or greater than maximum, or if any argument cannot be
+          validated.
+        """
+        nargs = len(args)
+        if self.maximum != None and nargs > self.maximum:
+            raise ConfigureError("extra trailing arguments")
+        parsed = list(args)
+        i = 0
+        try:
+            for validator in self.validators[:nargs]:
+                parsed[i] = validator(parsed[i])
+                i += 1
+        except Exception, e:
+            raise ConfigureError(self._failed[i] + str(e))
+        if nargs < self._required:
+            raise ConfigureError(self._missing[nargs])
+        return tuple(parsed)
+
+    def validate_many(self, argvs):
+        """
+        Apply the spec to each of the specified argument lists.  Every list
+        is validated before an error is raised, so the error describes every
+        invalid list at once.
+
+        :param argvs: The argument lists.
+        :type argvs: [[str]]
+        :returns: A list of tuples, in the same order as `argvs`.
+        :rtype: [(object)]
+        :raises ConfigureError: If any argument list is invalid.
+        """
+        results = []
+        errors = []
+        for index,args in enumerate(argvs):
+            try:
+                results.append(self(args))
+            except ConfigureError, e:
+                errors.append("arguments %i: %s" % (index, str(e)))
+        if len(errors) > 0:
+            raise ConfigureError("; ".join(errors))
+        return results
+
 def parse_args(args, *spec, **kwargs):
     """
     Returns a tuple containing arguments conforming to *spec.  if the number of
     command arguments is less than minimum or greater than maximum, or if any
     argument cannot be validated, ConfigureError is raised.  Any optional arguments
-    which are not specified are passed through unmodified.
+    which are not specified are passed through unmodified.  To validate many
+    argument lists against the same spec, create an :class:`ArgSpec` once.
 
     :param spec: a list of validator functions
     :type spec: [callable]
@@ -23,32 +149,4 @@ def parse_args(args, *spec, **kwargs):
     :returns: a tuple containing arguments conforming to spec
     :rtype: (object)
     """
-    try:
-        minimum = kwargs['minimum']
-    except:
-        minimum = None
-    try:
-        maximum = kwargs['maximum']
-    except:
-        maximum = None
-    try:
-        names = kwargs['names']
-    except:
-        names = None
-    if maximum != None and len(args) > maximum:
-        raise ConfigureError("extra trailing arguments")
-    parsed = args[:]
-    for i in range(len(spec)):
-        try:
-            validator = spec[i]
-            parsed[i] = validator(parsed[i])
-        except IndexError:
-            if minimum == None or i < minimum:
-                if names != None and i < len(names):
-                    raise ConfigureError("missing argument " + names[i])
-                raise ConfigureError("missing argument")
-        except Exception, e:
-            if names != None and i < len(names):
-                raise ConfigureError("failed to parse argument %s: %s" % (names[i], str(e)))
-            raise ConfigureError("failed to parse argument: %s" % str(e))
-    return tuple(parsed)
+    return ArgSpec(*spec, **kwargs)(args)
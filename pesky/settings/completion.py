@@ -0,0 +1,234 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import os, re, sys, bisect, inspect, marshal, pipes
+
+def completion_table(parser):
+    """
+    Walk the parser tree and return a dict mapping each command path (the
+    space-separated subcommand names below the root, '' for the root) to a
+    tuple containing a sorted list of the words which may be completed at
+    that point, a dict mapping each subcommand name, alias and unique prefix
+    to its command path, and a sorted list of the options which take an
+    argument.  Prefixes are resolved the same way as by the parser, so an
+    abbreviated subcommand is followed when completing the words after it.
+
+    :param parser: The root parser.
+    :type parser: :class:`OptionParser`
+    :rtype: dict
+    """
+    table = {}
+    stack = [('', parser)]
+    while len(stack) > 0:
+        path,parser = stack.pop()
+        words = ['--help', '--version']
+        hasarg = []
+        for o in parser._optslist:
+            flags = []
+            if o.shortname != '':
+                flags.append('-' + o.shortname)
+            if o.longname != '':
+                flags.append('--' + o.longname)
+            words.extend(flags)
+            if o.hasarg:
+                hasarg.extend(flags)
+        routes = {}
+        for prefix,name in parser._route_prefixes.items():
+            if name is not None:
+                routes[prefix] = (path + ' ' + name).lstrip()
+        for name,subcommand in parser._subcommands.items():
+            subpath = (path + ' ' + name).lstrip()
+            for route in [name] + subcommand._aliases:
+                routes[route] = subpath
+                words.append(route)
+            stack.append((subpath, subcommand))
+        table[path] = (sorted(words), routes, sorted(hasarg))
+    return table
+
+def _resolve(table, words):
+    """
+    Returns the command path reached after the specified words.
+    """
+    path = ''
+    skip = False
+    for word in words:
+        if skip:
+            skip = False
+            continue
+        candidates,routes,hasarg = table[path]
+        if word in hasarg:
+            skip = True
+        elif word in routes:
+            path = routes[word]
+    return path
+
+def _function_name(appname):
+    return '_' + re.sub(r'[^A-Za-z0-9_]', '_', os.path.basename(appname))
+
+def generate_bash(parser, appname=None):
+    """
+    Returns a bash completion script for the parser tree.
+
+    :param parser: The root parser.
+    :type parser: :class:`OptionParser`
+    :param appname: The command to complete.  Defaults to the parser appname.
+    :type appname: str
+    :rtype: str
+    """
+    if appname is None:
+        appname = os.path.basename(parser.appname)
+    table = completion_table(parser)
+    function = _function_name(appname)
+    lines = [
+        "%s()\n" % function,
+        "{\n",
+        "    local cur word words path skip i\n",
+        "    cur=\"${COMP_WORDS[COMP_CWORD]}\"\n",
+        "    path=''\n",
+        "    skip=0\n",
+        "    for (( i=1; i < COMP_CWORD; i++ )); do\n",
+        "        word=\"${COMP_WORDS[i]}\"\n",
+        "        if [[ $skip == 1 ]]; then\n",
+        "            skip=0\n",
+        "            continue\n",
+        "        fi\n",
+        "        case \"$path\" in\n",
+        ]
+    for path,(candidates,routes,hasarg) in sorted(table.items()):
+        if len(routes) == 0 and len(hasarg) == 0:
+            continue
+        lines.append("        %s)\n" % pipes.quote(path))
+        lines.append("            case \"$word\" in\n")
+        if len(hasarg) > 0:
+            lines.append("            %s) skip=1 ;;\n" % '|'.join([pipes.quote(w) for w in hasarg]))
+        for route,subpath in sorted(routes.items()):
+            lines.append("            %s) path=%s ;;\n" % (pipes.quote(route), pipes.quote(subpath)))
+        lines.append("            esac ;;\n")
+    lines.extend([
+        "        esac\n",
+        "    done\n",
+        "    case \"$path\" in\n",
+        ])
+    for path,(candidates,routes,hasarg) in sorted(table.items()):
+        lines.append("    %s) words=%s ;;\n" % (pipes.quote(path), pipes.quote(' '.join(candidates))))
+    lines.extend([
+        "    esac\n",
+        "    COMPREPLY=( $(compgen -W \"$words\" -- \"$cur\") )\n",
+        "}\n",
+        "complete -F %s %s\n" % (function, pipes.quote(appname)),
+        ])
+    return ''.join(lines)
+
+def generate_zsh(parser, appname=None):
+    """
+    Returns a zsh completion script for the parser tree.  The script uses
+    the zsh bash completion compatibility layer.
+
+    :param parser: The root parser.
+    :type parser: :class:`OptionParser`
+    :param appname: The command to complete.  Defaults to the parser appname.
+    :type appname: str
+    :rtype: str
+    """
+    if appname is None:
+        appname = os.path.basename(parser.appname)
+    return "#compdef %s\n\nautoload -U +X bashcompinit && bashcompinit\n\n%s" % (
+        appname, generate_bash(parser, appname))
+
+def write_completion_index(parser, path):
+    """
+    Write the completion table of the parser tree to the index file at path.
+
+    :param parser: The root parser.
+    :type parser: :class:`OptionParser`
+    :param path: The path of the index file.
+    :type path: str
+    """
+    with open(path, 'wb') as f:
+        marshal.dump(completion_table(parser), f)
+
+def load_completion_index(path):
+    """
+    Load a completion table written by :func:`write_completion_index`.
+
+    :param path: The path of the index file.
+    :type path: str
+    :rtype: dict
+    """
+    with open(path, 'rb') as f:
+        return marshal.load(f)
+
+def complete(table, words, cur):
+    """
+    Returns the list of completions for cur, given the preceding words of
+    the command line (excluding the command itself).  Completions are found
+    by binary search of the sorted candidates.
+
+    :param table: A completion table, or the path of a completion index file.
+    :type table: dict or str
+    :param words: The words preceding the word being completed.
+    :type words: [str]
+    :param cur: The word being completed.
+    :type cur: str
+    :rtype: [str]
+    """
+    if not isinstance(table, dict):
+        table = load_completion_index(table)
+    return _complete(table, words, cur)
+
+def _complete(table, words, cur):
+    """
+    Returns the candidates at the command path reached after words which
+    start with cur.
+    """
+    candidates = table[_resolve(table, words)][0]
+    completions = []
+    i = bisect.bisect_left(candidates, cur)
+    while i < len(candidates) and candidates[i].startswith(cur):
+        completions.append(candidates[i])
+        i += 1
+    return completions
+
+def write_completion_script(parser, path):
+    """
+    Write a standalone Python script to path, which prints the completions
+    for its arguments ([WORD...] CUR) using the embedded completion table
+    of the parser tree.  The script doesn't import pesky, so each query only
+    costs the startup time of the interpreter; running this module with -m
+    instead imports the pesky package and its dependencies on every query.
+
+    :param parser: The root parser.
+    :type parser: :class:`OptionParser`
+    :param path: The path of the script.
+    :type path: str
+    """
+    lines = [
+        "#!%s\n" % sys.executable,
+        "# generated by pesky.settings.completion, do not edit\n",
+        "import sys, bisect, marshal\n",
+        "\n",
+        "TABLE = marshal.loads(%r)\n" % marshal.dumps(completion_table(parser)),
+        "\n",
+        inspect.getsource(_resolve),
+        "\n",
+        inspect.getsource(_complete),
+        "\n",
+        "if len(sys.argv) < 2:\n",
+        "    sys.exit(2)\n",
+        "for completion in _complete(TABLE, sys.argv[1:-1], sys.argv[-1]):\n",
+        "    sys.stdout.write(completion + \"\\n\")\n",
+        ]
+    with open(path, 'w') as f:
+        f.write(''.join(lines))
+    os.chmod(path, 0755)
+
+if __name__ == '__main__':
+    # usage: python -m pesky.settings.completion INDEX [WORD...] CUR
+    # this imports the pesky package on every query, so latency sensitive
+    # callers should use the script written by write_completion_script.
+    if len(sys.argv) < 3:
+        sys.exit(2)
+    for completion in complete(sys.argv[1], sys.argv[2:-1], sys.argv[-1]):
+        sys.stdout.write(completion + "\n")
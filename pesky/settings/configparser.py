@@ -3,12 +3,21 @@
 # This file is part of Pesky.  Pesky is BSD-licensed software;
 # for copyright information see the LICENSE file.
 
-import os, sys
-from ConfigParser import RawConfigParser
+import os, sys, glob, marshal, hashlib, tempfile
+from multiprocessing.pool import ThreadPool
+from ConfigParser import RawConfigParser, DEFAULTSECT
+from StringIO import StringIO
 
+from pesky.settings.inireader import IniReader
+from pesky.settings.interpolation import Interpolator
+from pesky.settings.section import LazySection
 from pesky.settings.store import Store
+from pesky.settings.pool import submit
 from pesky.settings.errors import ConfigureError
 
+# bump this whenever the format of the compiled cache changes
+CACHE_VERSION = 1
+
 class ConfigParser(object):
     """
     Contains configuration loaded from the specified configuration file.
@@ -18,6 +27,13 @@ class ConfigParser(object):
         self._options = {}
         self.path = None
         self.required = False
+        self.cache_path = None
+        self.use_mmap = False
+        self.selective = False
+        self.directory = None
+        self.pattern = '*.conf'
+        self.threads = 8
+        self.interpolator = None
 
     def set_path(self, path):
         """
@@ -29,6 +45,78 @@ class ConfigParser(object):
         """
         self.required = required
 
+    def set_directory(self, directory, pattern='*.conf', threads=8):
+        """
+        Load configuration fragments from the files in directory matching
+        pattern, in addition to the configuration file.  Fragments are read
+        in parallel on a pool of threads, then merged in a deterministic order:
+        first the configuration file, then the fragments sorted by file name,
+        with later values overriding earlier ones.  The compiled cache and the
+        memory-mapped reader are not used when fragments are present.
+
+        :param directory: The fragments directory, or None to disable fragments.
+        :type directory: str
+        :param pattern: The glob pattern which fragment file names must match.
+        :type pattern: str
+        :param threads: The maximum number of files to read concurrently.
+        :type threads: int
+        """
+        self.directory = directory
+        self.pattern = pattern
+        self.threads = threads
+
+    def set_interpolation(self, interpolation, environ=None):
+        """
+        If interpolation is True, then expand ${section:option} and ${NAME}
+        references in configuration values, where NAME is an environment
+        variable, and $$ is a literal $.  Expanded values are memoized between
+        renders, and only the values affected by a change are expanded again.
+        Only the registered sections and the sections they reference are read
+        by the interpolator.  The compiled cache is not used when
+        interpolation is enabled, and sections skipped by selective loading
+        can't be referenced.
+
+        :param interpolation: True to enable interpolation.
+        :type interpolation: bool
+        :param environ: The environment to read, defaults to os.environ.
+        :type environ: dict
+        """
+        if interpolation:
+            self.interpolator = Interpolator(environ)
+        else:
+            self.interpolator = None
+
+    def set_cache_path(self, cache_path):
+        """
+        Cache the rendered configuration in the compiled cache file cache_path.
+        The cache is keyed by the path, mtime, size and content hash of the
+        configuration file, and by the registered sections and options, and
+        is used by :meth:`render` instead of parsing the configuration file
+        as long as it is valid.  If cache_path is None, then caching is
+        disabled.
+        """
+        self.cache_path = cache_path
+
+    def set_use_mmap(self, use_mmap):
+        """
+        If use_mmap is True, then read the configuration file through a memory
+        map with :class:`IniReader` instead of :class:`RawConfigParser`.  Only
+        the sections registered with :meth:`add_section` and :meth:`add_option`
+        are parsed, which makes rendering large files much cheaper.  Note that
+        syntax errors in unregistered sections are not detected.
+        """
+        self.use_mmap = use_mmap
+
+    def set_selective(self, selective):
+        """
+        If selective is True, then skip the bodies of sections which were not
+        registered with :meth:`add_section` or :meth:`add_option` while parsing
+        the configuration file, so that parse time and memory scale with the
+        registered sections rather than the size of the file.  Note that
+        syntax errors in unregistered sections are not detected.
+        """
+        self.selective = selective
+
     def add_section(self, section, path, required=False):
         """
         """
@@ -39,29 +127,275 @@ class ConfigParser(object):
         """
         self._options[(section,option)] = (path,required)
 
+    def get_section(self, section):
+        """
+        Returns a :class:`LazySection` for the specified section.  The
+        configuration is not read until a value is first requested from the
+        section.  It is then read the same way as by :meth:`render`, including
+        fragments and interpolation, except that the compiled cache is not
+        used, and only the specified section and DEFAULT are parsed.  If
+        interpolation is enabled, then the configuration file is read with
+        :class:`IniReader`, so that only the specified section and the
+        sections it references are decoded; if there are fragments, then
+        every file is parsed in full, since the sections are merged.
+
+        :param section: The name of the section.
+        :type section: str
+        :rtype: :class:`LazySection`
+        """
+        return LazySection(section, lambda: self._load_section(section), os.getcwd())
+
+    def _load_section(self, section):
+        """
+        Read the specified section, and return a RawConfigParser containing
+        only its (interpolated) values.
+        """
+        options = RawConfigParser()
+        try:
+            if self.interpolator is None:
+                config = self._load(set([section, DEFAULTSECT]))
+            elif self.path is not None and len(self._fragments()) == 0:
+                # decoded lazily, so the interpolator only decodes the
+                # section and the sections it references
+                config = IniReader(self.path)
+            else:
+                config = self._load(None)
+        except EnvironmentError as e:
+            if self.required:
+                raise ConfigureError("failed to read configuration: %s" % e.strerror)
+            return options
+        try:
+            if config.has_section(section):
+                options.add_section(section)
+                interpolator = None
+                if self.interpolator is not None:
+                    interpolator = Interpolator(self.interpolator.environ)
+                    interpolator.load(config, [section])
+                for name,value in config.items(section):
+                    if interpolator is not None:
+                        value = interpolator.get(section, name)
+                    options.set(section, name, value)
+        finally:
+            if isinstance(config, IniReader):
+                config.close()
+        return options
+
+    def _load(self, sections):
+        """
+        Read the configuration file and the fragments, and return the parsed
+        configuration.  If sections is not None, then only those sections are
+        parsed.
+        """
+        fragments = self._fragments()
+        if len(fragments) > 0 or self.path is None:
+            return self._read_fragments(fragments, sections)
+        if self.use_mmap:
+            return IniReader(self.path)
+        config = RawConfigParser()
+        with open(self.path, 'r') as f:
+            self._read(config, f, self.path, sections)
+        return config
+
+    def _fragments(self):
+        """
+        Returns the sorted paths of the configuration fragments.
+        """
+        if self.directory is None:
+            return []
+        return sorted(glob.glob(os.path.join(self.directory, self.pattern)))
+
+    def _selected(self):
+        """
+        Returns the set of sections to parse if selective loading is enabled,
+        otherwise None.
+        """
+        if not self.selective:
+            return None
+        sections = set(self._sections)
+        sections.update([section for section,option in self._options])
+        sections.add(DEFAULTSECT)
+        return sections
+
     def render(self):
         """
         """
         try:
-            store = Store()
+            fragments = self._fragments()
+            if len(fragments) > 0 or self.path is None:
+                return self._extract(self._read_fragments(fragments, self._selected()))
+            if self.cache_path is not None and self.interpolator is None:
+                return self._render_cached()
+            if self.use_mmap:
+                with IniReader(self.path) as config:
+                    return self._extract(config)
             with open(self.path, 'r') as f:
-                config = RawConfigParser()
-                config.readfp(f, self.path)
-                # parse sections 
-                for section,(path,required) in self._sections.iteritems():
-                    if config.has_section(section):
-                        for name,value in config.items(section):
-                            store.append(path + '.' + name, value)
-                    elif required:
-                        raise ConfigureError("missing required section %s" % section)
-                # parse items
-                for (section,option),(path,required) in self._options.iteritems():
-                    if config.has_option(section, option):
-                        store.append(path, config.get(section, option))
-                    elif required:
-                        raise ConfigureError("missing required option %s => %s" % (section, option))
-                return store
+                return self._render(f)
         except EnvironmentError as e:
             if self.required:
                 raise ConfigureError("failed to read configuration: %s" % e.strerror)
             return Store()
+
+    def render_async(self, callback=None):
+        """
+        Render the configuration on a background thread, so that the caller
+        (for example an event loop) is not blocked on file I/O.
+
+        :param callback: If specified, called with the :class:`Store` on
+          the background thread once rendering succeeds.
+        :type callback: callable
+        :returns: The pending result, whose get() method returns the
+          :class:`Store` or raises the rendering error or the error raised
+          by the callback.
+        :rtype: :class:`multiprocessing.pool.AsyncResult`
+        """
+        return submit(self.render, callback)
+
+    def _render(self, f):
+        """
+        """
+        config = RawConfigParser()
+        self._read(config, f, self.path, self._selected())
+        return self._extract(config)
+
+    def _read(self, config, f, path, sections):
+        """
+        Read the file f into config.  If sections is not None, then skip the
+        sections which are not in sections.
+        """
+        if sections is not None:
+            f = SectionFilter(f, sections)
+        config.readfp(f, path)
+
+    def _read_fragments(self, fragments, sections):
+        """
+        Read the configuration file and the fragments in parallel, then merge
+        them in order.  If sections is not None, then skip the sections which
+        are not in sections.  If there is neither a configuration file nor any
+        fragment, then the configuration is empty.
+        """
+        if self.path is not None:
+            paths = [self.path] + fragments
+        else:
+            paths = fragments
+        if len(paths) == 0:
+            return RawConfigParser()
+        pool = ThreadPool(min(self.threads, len(paths)))
+        try:
+            contents = pool.map(_read_file, paths)
+        finally:
+            pool.close()
+            pool.join()
+        config = RawConfigParser()
+        for path,data in zip(paths, contents):
+            if isinstance(data, EnvironmentError):
+                if path == self.path and not self.required:
+                    continue
+                raise ConfigureError("failed to read configuration %s: %s" % (path, data.strerror))
+            self._read(config, StringIO(data), path, sections)
+        return config
+
+    def _extract(self, config):
+        """
+        Copy the registered sections and options from config into a new store.
+        """
+        store = Store()
+        interpolator = self.interpolator
+        if interpolator is not None:
+            sections = set(self._sections)
+            sections.update([section for section,option in self._options])
+            interpolator.load(config, sections)
+        # parse sections 
+        for section,(path,required) in self._sections.iteritems():
+            if config.has_section(section):
+                for name,value in config.items(section):
+                    if interpolator is not None:
+                        value = interpolator.get(section, name)
+                    store.append(path + '.' + name, value)
+            elif required:
+                raise ConfigureError("missing required section %s" % section)
+        # parse items
+        for (section,option),(path,required) in self._options.iteritems():
+            if config.has_option(section, option):
+                if interpolator is not None:
+                    store.append(path, interpolator.get(section, option))
+                else:
+                    store.append(path, config.get(section, option))
+            elif required:
+                raise ConfigureError("missing required option %s => %s" % (section, option))
+        return store
+
+    def _render_cached(self):
+        """
+        Render the configuration from the compiled cache if it is valid,
+        otherwise parse the configuration file and update the cache.
+        """
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            contents = f.read()
+        key = (CACHE_VERSION, os.path.abspath(self.path), st.st_mtime, st.st_size,
+            hashlib.sha1(contents).hexdigest(),
+            tuple(sorted(self._sections.items())), tuple(sorted(self._options.items())))
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached_key,values = marshal.load(f)
+            if cached_key == key:
+                store = Store()
+                for name,curr in values.iteritems():
+                    store.set(name, curr)
+                return store
+        except (EnvironmentError, EOFError, ValueError, TypeError):
+            pass
+        store = self._render(StringIO(contents))
+        # the cache is only an optimization, so failing to write it is not an error
+        try:
+            fd,tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_path)))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    marshal.dump((key, dict(store.iteritems())), f)
+                os.rename(tmp_path, self.cache_path)
+            except:
+                os.unlink(tmp_path)
+                raise
+        except EnvironmentError:
+            pass
+        return store
+
+def _read_file(path):
+    """
+    Returns the contents of the file at path, or the error if the file could
+    not be read.
+    """
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except EnvironmentError as e:
+        return e
+
+class SectionFilter(object):
+    """
+    Wraps a file object, and only passes the lines belonging to the specified
+    sections through :meth:`readline`.  Lines of other sections are discarded
+    after inspecting their first character.
+
+    :param f: The file object to wrap.
+    :type f: file
+    :param sections: The names of the sections to pass through.
+    :type sections: set
+    """
+    def __init__(self, f, sections):
+        self._f = f
+        self._sections = sections
+        self._skipping = False
+
+    def readline(self):
+        readline = self._f.readline
+        while True:
+            line = readline()
+            if line == '':
+                return line
+            if line[0] == '[':
+                m = RawConfigParser.SECTCRE.match(line)
+                if m is not None:
+                    self._skipping = m.group('header') not in self._sections
+            if not self._skipping:
+                return line
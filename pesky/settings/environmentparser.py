@@ -14,24 +14,106 @@ class EnvironmentParser(object):
     """
     def __init__(self):
         self._envvars = {}
+        # (prefix,path,separator,lowercase) tuples, longest prefix first
+        self._prefixes = []
+        self._prefix_tuple = ()
+        # the store returned by the previous render, along with the
+        # (varname,value) pairs and the generation it was rendered from
+        self._store = None
+        self._snapshot = None
+        self._generation = None
 
     def add_env_var(self, name, path, required=False):
         """
         """
         self._envvars[name] = (path,required)
+        self._store = None
+
+    def add_env_prefix(self, prefix, path, separator='_', lowercase=True):
+        """
+        Map every environment variable whose name starts with prefix to a path
+        under the specified path.  The rest of the variable name is split on
+        separator to form the dotted path, so with the prefix 'MYAPP_' and the
+        path 'myapp', the variable MYAPP_DB_HOST is mapped to myapp.db.host.
+        If a variable matches more than one prefix, the longest prefix wins.
+
+        :param prefix: The variable name prefix.
+        :type prefix: str
+        :param path: The path which the mapped variables are placed under.
+        :type path: str
+        :param separator: The separator between path components in the name.
+        :type separator: str
+        :param lowercase: If True, then lowercase the mapped path components.
+        :type lowercase: bool
+        """
+        if separator == '':
+            raise ValueError("separator must not be empty")
+        self._prefixes.append((prefix, path, separator, lowercase))
+        self._prefixes.sort(key=lambda p: len(p[0]), reverse=True)
+        self._prefix_tuple = tuple([p[0] for p in self._prefixes])
+        self._store = None
  
-    def render(self, environ=None):
+    def render(self, environ=None, generation=None):
         """
+        Render the registered environment variables into a store.  Only the
+        registered variables are read from the environment, and the environment
+        is not copied.  If no prefixes were registered and none of the
+        registered variables changed since the previous render, then the
+        previous store is returned, so callers must not modify it.  If any
+        prefixes were registered, then the environment is scanned once for
+        all of them.
+
+        :param environ: The environment to read, defaults to os.environ.
+        :type environ: dict
+        :param generation: If specified, and equal to the generation passed to
+          the previous render, then the previous store is returned without
+          reading the environment at all.  Callers should change the generation
+          whenever the environment may have been modified.
+        :returns: The rendered store.
+        :rtype: :class:`Store`
         """
+        if self._store is not None and generation is not None and generation == self._generation:
+            return self._store
         if environ is None:
-            environ = os.environ.copy()
-        else:
-            environ = environ.copy()
+            environ = os.environ
+        get = environ.get
+        if self._store is not None and len(self._prefixes) == 0:
+            for varname,value in self._snapshot:
+                if get(varname) != value:
+                    break
+            else:
+                self._generation = generation
+                return self._store
         store = Store()
-        # parse sections 
+        snapshot = []
         for varname,(path,required) in self._envvars.iteritems():
-            if varname in environ:
-                store.append(path, environ[varname])
+            value = get(varname)
+            if value is not None:
+                store.append(path, value)
             elif required:
                 raise ConfigureError("missing required environment variable %s" % varname)
+            snapshot.append((varname, value))
+        if len(self._prefixes) > 0:
+            self._render_prefixes(environ, store)
+        self._store = store
+        self._snapshot = snapshot
+        self._generation = generation
         return store
+
+    def _render_prefixes(self, environ, store):
+        """
+        Scan the environment once, and append each variable matching one of
+        the registered prefixes to the store.
+        """
+        matches = self._prefix_tuple
+        for varname in [varname for varname in environ.keys() if varname.startswith(matches)]:
+            value = environ[varname]
+            for prefix,path,separator,lowercase in self._prefixes:
+                if varname.startswith(prefix):
+                    name = varname[len(prefix):]
+                    if name == '':
+                        break
+                    if lowercase:
+                        name = name.lower()
+                    store.append(path + '.' + name.replace(separator, '.'), value)
+                    break
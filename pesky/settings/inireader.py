@@ -0,0 +1,167 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import os, re, mmap
+from ConfigParser import DEFAULTSECT, NoSectionError, NoOptionError
+
+from pesky.settings.errors import ConfigureError
+
+# section headers must start at the beginning of a line
+_header = re.compile(r'^\[([^]\n]+)\]', re.M)
+_option = re.compile(r'(?P<option>[^:=\s][^:=]*)\s*(?P<vi>[:=])\s*(?P<value>.*)$')
+
+class IniReader(object):
+    """
+    Reads an INI-style configuration file through a memory map.  When the
+    reader is created only the section headers are located; the body of a
+    section is parsed and decoded the first time one of its options is
+    accessed, so sections which are never accessed cost nothing beyond the
+    header scan.  Parsing follows the rules of
+    :class:`ConfigParser.RawConfigParser`, and the reader implements the
+    subset of its read-only interface used by :class:`ConfigParser`.
+
+    :param path: The path of the configuration file.
+    :type path: str
+    """
+    def __init__(self, path):
+        self.path = path
+        self._regions = {}
+        self._parsed = {}
+        self._mm = None
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm is None:
+            return
+        # locate the byte range of each section body
+        start = None
+        name = None
+        for m in _header.finditer(self._mm):
+            if name is None:
+                self._check_preamble(m.start())
+            else:
+                self._regions.setdefault(name, []).append((start, m.start()))
+            name = m.group(1)
+            start = self._mm.find('\n', m.end()) + 1
+            if start == 0:
+                start = len(self._mm)
+        if name is None:
+            self._check_preamble(len(self._mm))
+        else:
+            self._regions.setdefault(name, []).append((start, len(self._mm)))
+
+    def close(self):
+        """
+        Release the memory map.  Sections which were already parsed remain
+        accessible.
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def optionxform(self, option):
+        return option.lower()
+
+    def _lines(self, start, end):
+        """
+        Iterate the lines in the specified byte range of the file.
+        """
+        mm = self._mm
+        while start < end:
+            eol = mm.find('\n', start, end)
+            if eol < 0:
+                eol = end
+            yield mm[start:eol]
+            start = eol + 1
+
+    def _check_preamble(self, end):
+        for line in self._lines(0, end):
+            if line.strip() != '' and line[0] not in '#;':
+                raise ConfigureError("%s contains no section headers" % self.path)
+
+    def _parse(self, name):
+        """
+        Parse and return the options of the specified section as a dict.
+        """
+        try:
+            return self._parsed[name]
+        except KeyError:
+            pass
+        options = {}
+        if name in self._regions and self._mm is None:
+            raise ConfigureError("%s is closed" % self.path)
+        for start,end in self._regions.get(name, []):
+            optname = None
+            for line in self._lines(start, end):
+                # comment or blank line?
+                if line.strip() == '' or line[0] in '#;':
+                    continue
+                if line[0] in 'rR' and line.split(None, 1)[0].lower() == 'rem':
+                    continue
+                # continuation line?
+                if line[0].isspace() and optname is not None:
+                    value = line.strip()
+                    if value:
+                        options[optname].append(value)
+                    continue
+                m = _option.match(line)
+                if m is None:
+                    raise ConfigureError("failed to parse %s section [%s]: %r" % (self.path, name, line))
+                optname,vi,optval = m.group('option', 'vi', 'value')
+                optname = self.optionxform(optname.rstrip())
+                # ';' is a comment delimiter only if it follows a spacing character
+                pos = optval.find(';')
+                if pos != -1 and optval[pos-1].isspace():
+                    optval = optval[:pos]
+                optval = optval.strip()
+                if optval == '""':
+                    optval = ''
+                options[optname] = [optval]
+        for optname,optval in options.items():
+            options[optname] = '\n'.join(optval)
+        self._parsed[name] = options
+        return options
+
+    def sections(self):
+        """
+        Returns a list of the section names, excluding DEFAULT.
+        """
+        return [name for name in self._regions if name != DEFAULTSECT]
+
+    def has_section(self, section):
+        return section != DEFAULTSECT and section in self._regions
+
+    def has_option(self, section, option):
+        option = self.optionxform(option)
+        if section == DEFAULTSECT or not section:
+            return option in self._parse(DEFAULTSECT)
+        if section not in self._regions:
+            return False
+        return option in self._parse(section) or option in self._parse(DEFAULTSECT)
+
+    def get(self, section, option):
+        option = self.optionxform(option)
+        if section != DEFAULTSECT and section not in self._regions:
+            raise NoSectionError(section)
+        options = self._parse(section)
+        if option in options:
+            return options[option]
+        defaults = self._parse(DEFAULTSECT)
+        if option in defaults:
+            return defaults[option]
+        raise NoOptionError(option, section)
+
+    def items(self, section):
+        if section != DEFAULTSECT and section not in self._regions:
+            raise NoSectionError(section)
+        items = self._parse(DEFAULTSECT).copy()
+        items.update(self._parse(section))
+        return items.items()
@@ -0,0 +1,221 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import os, re
+
+from pesky.settings.errors import ConfigureError
+
+# a reference is ${section:option} or ${ENVVAR}, and $$ is a literal $
+_token = re.compile(r'\$(?:\$|\{([^${}:]*)(?::([^${}]*))?\})')
+
+class Interpolator(object):
+    """
+    Expands references in configuration values.  ${section:option} is
+    replaced by the expanded value of option in section, ${NAME} is replaced
+    by the environment variable NAME, and $$ is replaced by a literal $.
+
+    Each value is parsed into a template once, and the references between
+    values form a dependency graph, which is resolved in topological order.
+    Resolved values are memoized, and when the configuration is reloaded
+    only the values which changed and the values which depend on them, directly
+    or transitively, are resolved again.
+
+    :param environ: The environment to read, defaults to os.environ.
+    :type environ: dict
+    """
+    def __init__(self, environ=None):
+        self.environ = environ
+        self._raw = {}
+        self._templates = {}
+        self._resolved = {}
+        # maps each key to the set of keys which reference it
+        self._dependents = {}
+        # maps each referenced environment variable to its value and the
+        # set of keys which reference it
+        self._env = {}
+
+    def load(self, config, sections=None):
+        """
+        Load the values of the specified sections of config, which is a
+        :class:`ConfigParser.RawConfigParser` or :class:`IniReader`, and of
+        the sections they reference, directly or transitively.  Other sections
+        are not read, so an :class:`IniReader` doesn't decode them.  Memoized
+        values which are not affected by the changes since the previous load
+        are kept.
+
+        :param config: The parsed configuration.
+        :param sections: The names of the sections to load, or None to load
+          every section.
+        :type sections: [str]
+        :returns: The set of (section,option) keys which must be resolved again.
+        :rtype: set
+        """
+        environ = self.environ if self.environ is not None else os.environ
+        if sections is None:
+            sections = config.sections()
+        raw = {}
+        pending = list(sections)
+        loaded = set()
+        while len(pending) > 0:
+            section = pending.pop()
+            if section in loaded:
+                continue
+            loaded.add(section)
+            if not config.has_section(section):
+                continue
+            for option,value in config.items(section):
+                raw[(section, option)] = value
+                if '${' in value:
+                    for m in _token.finditer(value):
+                        if m.group(2) is not None:
+                            pending.append(m.group(1))
+        changed = set()
+        for key,value in raw.iteritems():
+            if self._raw.get(key) != value:
+                changed.add(key)
+        for key in self._raw:
+            if key not in raw:
+                changed.add(key)
+        # parse the new values before modifying the graph, so that an invalid
+        # value leaves the interpolator unchanged
+        templates = dict([(key, self._parse(key, raw[key])) for key in changed if key in raw])
+        stack = list(changed)
+        for name,(value,dependents) in self._env.items():
+            if environ.get(name) != value:
+                stack.extend(dependents)
+                self._env[name] = (environ.get(name), dependents)
+        # invalidate the changed keys and everything which depends on them
+        invalid = set()
+        while len(stack) > 0:
+            key = stack.pop()
+            if key in invalid:
+                continue
+            invalid.add(key)
+            stack.extend(self._dependents.get(key, ()))
+        for key in invalid:
+            self._resolved.pop(key, None)
+        for key in changed:
+            self._unlink(key)
+            if key in templates:
+                self._link(key, templates[key], environ)
+        self._raw = raw
+        return invalid
+
+    def _parse(self, key, value):
+        """
+        Parse the value into a template, which is a list of parts.  A part is
+        either a literal str, or a tuple containing a (section,option) key, or
+        a tuple containing None and an environment variable name.
+        """
+        template = []
+        position = 0
+        for m in _token.finditer(value):
+            if m.start() > position:
+                template.append(self._literal(key, value[position:m.start()]))
+            position = m.end()
+            section,option = m.groups()
+            if section is None:
+                template.append('$')
+            elif option is None:
+                template.append((None, section))
+            else:
+                template.append((section, option.lower()))
+        if position < len(value):
+            template.append(self._literal(key, value[position:]))
+        return template
+
+    def _literal(self, key, literal):
+        if '${' in literal:
+            raise ConfigureError("invalid reference in [%s]=>%s" % key)
+        return literal
+
+    def _link(self, key, template, environ):
+        """
+        Add the template of key and its references to the graph.
+        """
+        self._templates[key] = template
+        for part in template:
+            if isinstance(part, tuple):
+                if part[0] is None:
+                    name = part[1]
+                    if name not in self._env:
+                        self._env[name] = (environ.get(name), set())
+                    self._env[name][1].add(key)
+                else:
+                    self._dependents.setdefault(part, set()).add(key)
+
+    def _unlink(self, key):
+        """
+        Remove the references of key from the graph.
+        """
+        for part in self._templates.pop(key, ()):
+            if isinstance(part, tuple):
+                if part[0] is None:
+                    dependents = self._env[part[1]][1]
+                    dependents.discard(key)
+                    if len(dependents) == 0:
+                        del self._env[part[1]]
+                else:
+                    dependents = self._dependents[part]
+                    dependents.discard(key)
+                    if len(dependents) == 0:
+                        del self._dependents[part]
+
+    def get(self, section, option):
+        """
+        Returns the expanded value of option in section.
+
+        :raises ConfigureError: If the option doesn't exist, or a reference
+          is undefined or part of a cycle.
+        """
+        key = (section, option.lower())
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        if key not in self._templates:
+            raise ConfigureError("no configuration item [%s]=>%s" % key)
+        resolved = self._resolved
+        templates = self._templates
+        # depth-first walk of the unresolved references of key, resolving
+        # each value after all of its references have been resolved
+        visiting = set([key])
+        stack = [(key, [part for part in templates[key] if isinstance(part, tuple)])]
+        while len(stack) > 0:
+            curr,refs = stack[-1]
+            while len(refs) > 0:
+                ref = refs.pop()
+                if ref[0] is None or ref in resolved:
+                    continue
+                if ref in visiting:
+                    raise ConfigureError("reference cycle in [%s]=>%s" % curr)
+                if ref not in templates:
+                    raise ConfigureError("undefined reference ${%s:%s} in [%s]=>%s" % (ref + curr))
+                visiting.add(ref)
+                stack.append((ref, [part for part in templates[ref] if isinstance(part, tuple)]))
+                break
+            else:
+                stack.pop()
+                visiting.discard(curr)
+                resolved[curr] = self._expand(curr)
+        return resolved[key]
+
+    def _expand(self, key):
+        """
+        Expand the template of key, whose references have all been resolved.
+        """
+        parts = []
+        for part in self._templates[key]:
+            if not isinstance(part, tuple):
+                parts.append(part)
+            elif part[0] is None:
+                value = self._env[part[1]][0]
+                if value is None:
+                    raise ConfigureError("undefined environment variable ${%s} in [%s]=>%s" % (
+                        (part[1],) + key))
+                parts.append(value)
+            else:
+                parts.append(self._resolved[part])
+        return ''.join(parts)
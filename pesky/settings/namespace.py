@@ -3,6 +3,9 @@
 # This file is part of Pesky.  Pesky is BSD-licensed software;
 # for copyright information see the LICENSE file.
 
+import threading
+
+from pesky.settings.store import Store
 from pesky.settings.errors import ConfigureError
 
 class Namespace(object):
@@ -10,13 +13,70 @@ class Namespace(object):
     """
     def __init__(self):
         self._store = Store()
+        self._sources = []
+        # the coerced settings, if the namespace was validated by a Schema
+        self.typed = None
 
     def merge(self, store):
         """
         """
-        for name,values in store.iter():
+        for name,values in store.iteritems():
             for value in values:
-                self._store.append(name, values)
+                self._store.append(name, value)
+        self._sources.append(store)
+
+    def replace(self, previous, store, delta=None):
+        """
+        Replace a store which was previously merged into the namespace with
+        a new version of the store, for example when a configuration file is
+        reloaded.  Only the names which differ between the two versions are
+        touched, and merge order is preserved.  Finding those names with
+        :meth:`Store.diff` compares every name in both stores; if the caller
+        already knows them, for example from the notification of a
+        :class:`ConfigWatcher`, then passing them as delta makes the cost
+        proportional to the size of the change rather than the size of the
+        stores.
+
+        :param previous: The store which was previously merged.
+        :type previous: :class:`Store`
+        :param store: The new version of the store.
+        :type store: :class:`Store`
+        :param delta: The sets of added, removed and changed names, as
+          returned by previous.diff(store), or None to compute them.
+        :type delta: (set, set, set)
+        :returns: A tuple containing the sets of added, removed and changed names.
+        :rtype: (set, set, set)
+        :raises ValueError: If previous was not merged into the namespace.
+        """
+        for index,source in enumerate(self._sources):
+            if source is previous:
+                break
+        else:
+            raise ValueError("store was not merged into the namespace")
+        self._sources[index] = store
+        added = set()
+        removed = set()
+        changed = set()
+        if delta is None:
+            delta = previous.diff(store)
+        for names in delta:
+            for name in names:
+                values = []
+                for source in self._sources:
+                    curr = source.get(name)
+                    if curr is not None:
+                        values.extend(curr)
+                existing = self._store.get(name)
+                if len(values) == 0:
+                    self._store.remove(name)
+                    removed.add(name)
+                elif existing is None:
+                    self._store.set(name, values)
+                    added.add(name)
+                elif existing != values:
+                    self._store.set(name, values)
+                    changed.add(name)
+        return added, removed, changed
 
     def contains(self, name):
         """
@@ -32,10 +92,199 @@ class Namespace(object):
     def get(self, name):
         """
         """
-        return self._store.get(name, None)
+        return self._store.get(name)
 
     def iteritems(self):
         """
         Iterate all (name,value) pairs.
         """
         return self._store.iteritems()
+
+    def iter_prefix(self, prefix):
+        """
+        Iterate all (name,value) pairs where name is equal to prefix or is a
+        descendent of prefix, e.g. the prefix 'myapp.db' matches 'myapp.db.host'
+        but not 'myapp.dbname'.
+        """
+        return self._store.iter_prefix(prefix)
+
+    def subtree(self, prefix):
+        """
+        Returns a view of all names under the specified prefix.  The view
+        reflects later modifications to the namespace.
+
+        :param prefix: The dotted path prefix.
+        :type prefix: str
+        :returns: The view.
+        :rtype: :class:`NamespaceView`
+        """
+        return NamespaceView(self._store, prefix)
+
+    def freeze(self):
+        """
+        Returns an immutable snapshot of the namespace.  The snapshot is not
+        affected by later modifications to the namespace, so it can be shared
+        between threads without locking or copying.
+
+        :returns: The snapshot.
+        :rtype: :class:`FrozenNamespace`
+        """
+        return FrozenNamespace(dict([(name, tuple(values)) for name,values in self._store.iteritems()]))
+
+class NamespaceView(object):
+    """
+    A live view of the names under a prefix of a :class:`Namespace`.  Names
+    passed to and returned from the view are relative to the prefix.
+    """
+    def __init__(self, store, prefix):
+        self._store = store
+        self.prefix = prefix.rstrip('.')
+
+    def _path(self, name):
+        if self.prefix == '':
+            return name
+        return self.prefix + '.' + name
+
+    def contains(self, name):
+        """
+        Returns True if the specified name exists, otherwise False.
+
+        :param name: The name, relative to the prefix.
+        :type name: str
+        :returns: True or False.
+        :rtype: [bool]
+        """
+        return self._store.contains(self._path(name))
+
+    def get(self, name):
+        """
+        Returns the values for the specified name relative to the prefix, or
+        None if the name does not exist.
+        """
+        return self._store.get(self._path(name))
+
+    def iteritems(self):
+        """
+        Iterate all (name,value) pairs under the prefix.  Names are relative
+        to the prefix; the prefix itself is returned as ''.
+        """
+        skip = len(self.prefix) + 1 if self.prefix != '' else 0
+        for name,values in self._store.iter_prefix(self.prefix):
+            yield name[skip:], values
+
+    def subtree(self, prefix):
+        """
+        Returns a view of all names under the specified prefix, relative to
+        the prefix of this view.
+        """
+        return NamespaceView(self._store, self._path(prefix.rstrip('.')))
+
+class FrozenNamespace(object):
+    """
+    An immutable snapshot of a :class:`Namespace`.  Values are stored as
+    tuples, so they can be returned to callers without copying.
+    """
+    __slots__ = ('_values',)
+
+    def __init__(self, values):
+        object.__setattr__(self, '_values', values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenNamespace is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("FrozenNamespace is immutable")
+
+    def contains(self, name):
+        """
+        Returns True if the specified name exists, otherwise False.
+
+        :param name: The name.
+        :type name: str
+        :returns: True or False.
+        :rtype: [bool]
+        """
+        return name in self._values
+
+    def get(self, name):
+        """
+        Returns the tuple of values for the specified name, or None if the
+        name does not exist.
+        """
+        return self._values.get(name)
+
+    def iteritems(self):
+        """
+        Iterate all (name,value) pairs.
+        """
+        return self._values.iteritems()
+
+    def __len__(self):
+        return len(self._values)
+
+class SharedNamespace(object):
+    """
+    A namespace which is shared between threads.  Readers always see a
+    complete, immutable :class:`FrozenNamespace` and never take a lock;
+    writers build a new version and publish it by swapping a single
+    reference, so readers which fetched the previous version keep using it
+    undisturbed (read-copy-update).  A reader which needs several values to
+    be consistent with each other should fetch them from one snapshot.
+
+    :param namespace: The initial version, or None for an empty namespace.
+    :type namespace: :class:`Namespace` or :class:`FrozenNamespace`
+    """
+    def __init__(self, namespace=None):
+        self._lock = threading.Lock()
+        self._current = None
+        self.generation = 0
+        self.publish(namespace)
+
+    def publish(self, namespace):
+        """
+        Atomically replace the current version.  Writers are serialized, so
+        the generation increases by exactly one per call.
+
+        :param namespace: The new version, or None for an empty namespace.
+        :type namespace: :class:`Namespace` or :class:`FrozenNamespace`
+        :returns: The published snapshot.
+        :rtype: :class:`FrozenNamespace`
+        """
+        if namespace is None:
+            snapshot = FrozenNamespace({})
+        elif isinstance(namespace, FrozenNamespace):
+            snapshot = namespace
+        else:
+            snapshot = namespace.freeze()
+        with self._lock:
+            self._current = snapshot
+            self.generation += 1
+        return snapshot
+
+    def snapshot(self):
+        """
+        Returns the current version.
+
+        :rtype: :class:`FrozenNamespace`
+        """
+        return self._current
+
+    def contains(self, name):
+        """
+        Returns True if the specified name exists in the current version,
+        otherwise False.
+        """
+        return self._current.contains(name)
+
+    def get(self, name):
+        """
+        Returns the tuple of values for the specified name in the current
+        version, or None if the name does not exist.
+        """
+        return self._current.get(name)
+
+    def iteritems(self):
+        """
+        Iterate all (name,value) pairs of the current version.
+        """
+        return self._current.iteritems()
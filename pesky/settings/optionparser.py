@@ -8,6 +8,21 @@ import os, sys, getopt
 from pesky.settings.store import Store
 from pesky.settings.errors import ConfigureError
 
+def index_prefixes(prefixes, name, target=None):
+    """
+    Add each proper prefix of name to the prefix index.  A prefix maps to
+    target, which defaults to the name it abbreviates, or to None if it
+    abbreviates names with different targets.
+    """
+    if target is None:
+        target = name
+    for i in range(1, len(name)):
+        prefix = name[:i]
+        if prefixes.get(prefix, target) != target:
+            prefixes[prefix] = None
+        else:
+            prefixes[prefix] = target
+
 class OptionParser(object):
     """
     :param parent:
@@ -25,18 +40,34 @@ class OptionParser(object):
         self._parent = None
         self._command = None
         self._subcommands = {}
+        self._aliases = []
+        # maps subcommand names and aliases to subcommand parsers, and their
+        # prefixes to the name or alias they abbreviate
+        self._routes = {}
+        self._route_prefixes = {}
         self._options = {}
         self._optslist = []
+        # the dispatch tables map an option name to a (handler, hasarg) pair,
+        # and are compiled as options are added
+        self._shortopts = {}
+        self._longopts = {}
+        # maps each prefix of a long option name to the name, or to None if
+        # the prefix is shared by more than one name
+        self._prefixes = {}
+        self._add_longopt('help', self._help, False)
+        self._add_longopt('version', self._version, False)
         self.appname = sys.argv[0]
         self.version = None
         self.usage = ''
         self.description = ''
         self.subusage = 'Available subcommands:'
+        self._helptext = None
 
     def set_appname(self, appname):
         """
         """
         self.appname = appname
+        self._invalidate_help(recursive=True)
 
     def set_version(self, version):
         """
@@ -47,31 +78,71 @@ class OptionParser(object):
         """
         """
         self.description = description
+        self._invalidate_help()
 
     def set_usage(self, usage):
         """
         """
         self.usage = usage
+        self._invalidate_help()
 
     def set_subusage(self, subusage):
         """
         """
         self.subusage = subusage
+        self._invalidate_help()
 
-    def add_subcommand(self, name):
+    def add_subcommand(self, name, aliases=None):
         """
-        Add a subcommand to the parser.
+        Add a subcommand to the parser.  On the command line, the subcommand
+        may be specified by its name, by one of its aliases, or by a unique
+        prefix of either.
+
         :param name:
         :type name: str
+        :param aliases: Alternative names for the subcommand.
+        :type aliases: [str]
         """
-        if name in self._subcommands:
-            raise ConfigureError("subcommand '%s' is already defined" % name)
+        if aliases is None:
+            aliases = []
+        for route in [name] + list(aliases):
+            if route in self._routes:
+                raise ConfigureError("subcommand '%s' is already defined" % route)
         subcommand = OptionParser()
         subcommand._command = name
         subcommand._parent = self
+        subcommand._aliases = list(aliases)
         self._subcommands[name] = subcommand
+        for route in [name] + list(aliases):
+            self._routes[route] = subcommand
+            index_prefixes(self._route_prefixes, route, name)
+        self._invalidate_help()
         return subcommand
 
+    def _route(self, name):
+        """
+        Returns the subcommand parser for the specified name, alias or prefix.
+        """
+        try:
+            return self._routes[name]
+        except KeyError:
+            pass
+        route = self._route_prefixes.get(name, '')
+        if route == '':
+            raise ConfigureError("no subcommand named '%s'" % name)
+        if route is None:
+            raise ConfigureError("subcommand '%s' is ambiguous" % name)
+        return self._routes[route]
+
+    def add(self, instance):
+        """
+        Add a command-line option or switch which was created by the caller.
+
+        :param instance: The option or switch.
+        :type instance: :class:`Option` or :class:`Switch`
+        """
+        self._add(instance)
+
     def _add(self, instance):
         """
         Add a command-line option or switch.
@@ -79,13 +150,25 @@ class OptionParser(object):
         :param o: o
         :type o: :class:`Option`
         """
-        if instance.shortname in self._options:
+        if instance.shortname != '' and "-%s" % instance.shortname in self._options:
             raise RuntimeError("-%s is already defined" % instance.shortname)
-        if instance.longname in self._options:
+        if instance.longname != '' and "--%s" % instance.longname in self._options:
             raise RuntimeError("--%s is already defined" % instance.longname)
-        self._options["-%s" % instance.shortname] = instance
-        self._options["--%s" % instance.longname] = instance
+        if instance.shortname != '':
+            self._options["-%s" % instance.shortname] = instance
+            self._shortopts[instance.shortname] = (instance.apply, instance.hasarg)
+        if instance.longname != '':
+            self._options["--%s" % instance.longname] = instance
+            self._add_longopt(instance.longname, instance.apply, instance.hasarg)
         self._optslist.append(instance)
+        self._invalidate_help()
+
+    def _add_longopt(self, longname, handler, hasarg):
+        """
+        Add a long option to the dispatch table and the prefix index.
+        """
+        self._longopts[longname] = (handler, hasarg)
+        index_prefixes(self._prefixes, longname)
 
     def add_option(self, shortname, longname, path, help=None, metavar=None, recurring=False):
         """
@@ -135,6 +218,97 @@ class OptionParser(object):
     def add_longswitch(self, longname, path, reverse=False, help=None, recurring=False):
         self._add(LongSwitch(longname, path, reverse, help, recurring))
 
+    def _invalidate_help(self, recursive=False):
+        """
+        Discard the cached help text.  If recursive is True, then also discard
+        the cached help text of all subcommands.
+        """
+        self._helptext = None
+        if recursive:
+            for subcommand in self._subcommands.values():
+                subcommand._invalidate_help(recursive=True)
+
+    def get_help(self):
+        """
+        Returns the help text for the parser.  The text is rendered the first
+        time it is requested, and cached until the parser is modified.
+
+        :rtype: str
+        """
+        if self._helptext is None:
+            self._helptext = self._format_help(self._command_line())
+        return self._helptext
+
+    def _command_line(self):
+        """
+        Returns the command line which invokes the parser, starting with the
+        application name.
+        """
+        commands = []
+        parser = self
+        while parser._parent is not None:
+            commands.append(parser._command)
+            parser = parser._parent
+        commands.append(parser.appname)
+        commands.reverse()
+        return ' '.join(commands)
+
+    def render_help_tree(self):
+        """
+        Returns the help text for the parser and every subcommand beneath it,
+        as a list of (command, helptext) pairs in depth-first order.
+
+        :rtype: [(str, str)]
+        """
+        helptexts = []
+        stack = [(self._command_line(), self)]
+        while len(stack) > 0:
+            commands,parser = stack.pop()
+            if parser._helptext is None:
+                parser._helptext = parser._format_help(commands)
+            helptexts.append((commands, parser._helptext))
+            for name,subcommand in sorted(parser._subcommands.items(), reverse=True):
+                stack.append((commands + ' ' + name, subcommand))
+        return helptexts
+
+    def _format_help(self, commands):
+        """
+        Render the help text for the parser, which is invoked as commands.
+        """
+        lines = ["Usage: %s %s\n" % (commands, self.usage), "\n"]
+        # display the description, if it was specified
+        if self.description != None and self.description != '':
+            lines.append(self.description + "\n")
+            lines.append("\n")
+        # display options
+        if len(self._optslist) > 0:
+            options = []
+            for o in self._optslist:
+                spec = []
+                if o.shortname != '':
+                    spec.append("-%s" % o.shortname)
+                if o.longname != '':
+                    spec.append("--%s" % o.longname)
+                if o.hasarg:
+                    spec = ','.join(spec) + ' ' + o.metavar
+                else:
+                    spec = ','.join(spec)
+                options.append((spec, o.help))
+            width = max([len(spec) for spec,help in options]) + 4
+            for spec,help in options:
+                if help is None:
+                    help = ''
+                lines.append(" %s%s\n" % (spec.ljust(width), help))
+            lines.append("\n")
+        # display subcommands, if there are any
+        if len(self._subcommands) > 0:
+            lines.append(self.subusage + "\n")
+            lines.append("\n")
+            for command in sorted(self._subcommands):
+                lines.append(" %s\n" % command)
+            lines.append("\n")
+        return ''.join(lines)
+
     def render(self, argv=None):
         """
         Parse the command line specified by argv.  If argv is None,
@@ -148,45 +322,126 @@ class OptionParser(object):
         store.append("program.command", sys.argv[0])
         return self._render(argv[1:], store)
 
+    def render_many(self, argv_list):
+        """
+        Parse each command line in argv_list, and return a list containing
+        a store for each command line.  Every command line is parsed before
+        an error is raised, so the error describes every invalid command line
+        at once, identified by its index in argv_list.  A command line which
+        requests help or the version is reported as invalid.
+
+        :raises ConfigureError: If any command line is invalid.
+        """
+        stores = []
+        errors = []
+        command = sys.argv[0]
+        for index,argv in enumerate(argv_list):
+            store = Store()
+            store.append("program.command", command)
+            try:
+                stores.append(self._render(argv[1:], store))
+            except (ConfigureError, getopt.GetoptError), e:
+                errors.append("command line %i: %s" % (index, str(e)))
+            except ProgramUsage:
+                errors.append("command line %i: help requested" % index)
+            except ProgramVersion:
+                errors.append("command line %i: version requested" % index)
+        if len(errors) > 0:
+            raise ConfigureError("; ".join(errors))
+        return stores
+
+    def _help(self, store, opt_name, opt_value):
+        raise ProgramUsage(self)
+
+    def _version(self, store, opt_name, opt_value):
+        raise ProgramVersion(self)
+
     def _render(self, argv, store):
         """
+        Parse argv in a single pass, resolving each subcommand through the
+        routing index of its parent as it is reached.
         """
-        shortnames = ''.join([o.shortident for o in self._optslist if o.shortname != ''])
-        longnames = [o.longident for o in self._optslist if o.longname != '']
-        longnames += ['help', 'version']
-        if len(self._subcommands) == 0:
-            options,args = getopt.gnu_getopt(argv, shortnames, longnames)
-        else:
-            options,args = getopt.getopt(argv, shortnames, longnames)
-        for opt_name,opt_value in options:
-            if opt_name == '--help':
-                raise ProgramUsage(self)
-            if opt_name == '--version':
-                raise ProgramVersion(self)
-            target = self._options[opt_name]
-            if isinstance(target, Option):
-                if store.contains(target.path) and not target.recurring:
-                    raise ConfigureError("%s can only be specified once" % opt_name)
-                store.append(target.path, opt_value)
-            elif isinstance(target, Switch):
-                if store.contains(target.path) and not target.recurring:
-                    raise ConfigureError("%s can only be specified once" % opt_name)
-                if target.reverse == True:
-                    store.append(target.path, 'false')
-                else:
-                    store.append(target.path, 'true')
-            else:
-                raise ValueError("Unknown target type %s" % target.__class__.__name__)
-        if len(self._subcommands) > 0:
-            if len(args) == 0:
+        parser = self
+        i = 0
+        while True:
+            i = parser._parse_options(argv, i, store)
+            if len(parser._subcommands) == 0:
+                return store
+            if i == len(argv):
                 raise ConfigureError("no subcommand specified")
-            subcommand = args[0]
-            args = args[1:]
-            if not subcommand in self._subcommands:
-                raise ConfigureError("no subcommand named '%s'" % subcommand)
-            store.append('pesky.option.command', subcommand)
-            return self._subcommands[subcommand]._render(args, store)
-        return store
+            parser = parser._route(argv[i])
+            store.append('pesky.option.command', parser._command)
+            i += 1
+
+    def _parse_options(self, argv, i, store):
+        """
+        Parse the options in argv starting at index i, and return the index
+        where option parsing stopped.  If the parser has no subcommands then
+        options and arguments may be interleaved, otherwise option parsing
+        stops at the first argument, which names the subcommand.  Errors are
+        reported with the same exceptions and messages as the getopt module,
+        and as with getopt, options are only applied to the store once they
+        have all been tokenized.
+        """
+        permute = len(self._subcommands) == 0
+        shortopts = self._shortopts
+        longopts = self._longopts
+        options = []
+        nargs = len(argv)
+        while i < nargs:
+            arg = argv[i]
+            i += 1
+            if arg == '--':
+                break
+            if arg.startswith('--'):
+                name,sep,value = arg[2:].partition('=')
+                try:
+                    handler,hasarg = longopts[name]
+                except KeyError:
+                    longname = self._prefixes.get(name, '')
+                    if longname == '':
+                        raise getopt.GetoptError('option --%s not recognized' % name, name)
+                    if longname is None:
+                        raise getopt.GetoptError('option --%s not a unique prefix' % name, name)
+                    name = longname
+                    handler,hasarg = longopts[name]
+                if hasarg:
+                    if sep == '':
+                        if i == nargs:
+                            raise getopt.GetoptError('option --%s requires argument' % name, name)
+                        value = argv[i]
+                        i += 1
+                elif sep != '':
+                    raise getopt.GetoptError('option --%s must not have an argument' % name, name)
+                options.append((handler, '--' + name, value))
+            elif arg.startswith('-') and arg != '-':
+                # short options may be bundled, and the last one may take an argument
+                j = 1
+                while j < len(arg):
+                    name = arg[j]
+                    j += 1
+                    try:
+                        handler,hasarg = shortopts[name]
+                    except KeyError:
+                        raise getopt.GetoptError('option -%s not recognized' % name, name)
+                    if not hasarg:
+                        options.append((handler, '-' + name, ''))
+                        continue
+                    if j < len(arg):
+                        value = arg[j:]
+                    elif i < nargs:
+                        value = argv[i]
+                        i += 1
+                    else:
+                        raise getopt.GetoptError('option -%s requires argument' % name, name)
+                    options.append((handler, '-' + name, value))
+                    break
+            elif not permute:
+                i -= 1
+                break
+        for handler,opt_name,opt_value in options:
+            handler(store, opt_name, opt_value)
+        return i
 
 class Option(object):
     """
@@ -194,9 +449,8 @@ class Option(object):
     """
     def __init__(self, shortname, longname, path, help, metavar, recurring):
         self.shortname = shortname
-        self.shortident = "%s:" % shortname
         self.longname = longname
-        self.longident = "%s=" % longname
+        self.hasarg = True
         self.path = path
         self.help = help
         if metavar is not None:
@@ -205,6 +459,14 @@ class Option(object):
             self.metavar = 'VALUE'
         self.recurring = recurring
 
+    def apply(self, store, opt_name, opt_value):
+        """
+        Append the option value to the store.
+        """
+        if not self.recurring and store.contains(self.path):
+            raise ConfigureError("%s can only be specified once" % opt_name)
+        store.append(self.path, opt_value)
+
 class ShortOption(Option):
     """
     A command line option with only a short name.
@@ -225,13 +487,24 @@ class Switch(object):
     """
     def __init__(self, shortname, longname, path, reverse, help, recurring):
         self.shortname = shortname
-        self.shortident = shortname
         self.longname = longname
-        self.longident = longname
+        self.hasarg = False
         self.path = path
         self.reverse = reverse
         self.help = help
         self.recurring = recurring
+        if reverse == True:
+            self.value = 'false'
+        else:
+            self.value = 'true'
+
+    def apply(self, store, opt_name, opt_value):
+        """
+        Append the switch value to the store.
+        """
+        if not self.recurring and store.contains(self.path):
+            raise ConfigureError("%s can only be specified once" % opt_name)
+        store.append(self.path, self.value)
 
 class ShortSwitch(Switch):
     """
@@ -254,46 +527,7 @@ class ProgramUsage(Exception):
     def __init__(self, parser):
         self._parser = parser
     def __str__(self):
-        string = ""
-        commands = []
-        parser = self._parser
-        while parser != None:
-            commands.insert(0, parser._command)
-            parser = parser._parent
-        string += "Usage: %s %s\n" % (' '.join(commands), self.usage)
-        string += "\n" 
-        # display the description, if it was specified
-        if self.description != None and self.description != '':
-            string += self.description + "\n"
-            string += "\n"
-        # display options
-        if len(self._optslist) > 0:
-            options = []
-            maxlength = 0
-            for o in self._optslist:
-                spec = []
-                if o.shortname != '':
-                    spec.append("-%s" % o.shortname)
-                if o.longname != '':
-                    spec.append("--%s" % o.longname)
-                if isinstance(o, Switch):
-                    spec = ','.join(spec)
-                elif isinstance(o, Option):
-                    spec = ','.join(spec) + ' ' + o.metavar
-                options.append((spec, o.help))
-                if len(spec) > maxlength:
-                    maxlength = len(spec)
-            for spec,help in options: 
-                string += " %s%s\n" % (spec.ljust(maxlength + 4), help)
-            string += "\n"
-        # display subcommands, if there are any
-        if len(self._subcommands) > 0:
-            string += self.subusage + "\n"
-            string += "\n"
-            for command,parser in sorted(self._subcommands.items()):
-                string += " %s\n" % command
-            string += "\n"
-        return string
+        return self._parser.get_help()
 
 class ProgramVersion(Exception):
     """
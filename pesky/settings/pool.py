@@ -0,0 +1,46 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import threading
+from multiprocessing.pool import ThreadPool
+
+_pool = None
+_lock = threading.Lock()
+
+def get_pool():
+    """
+    Returns the thread pool used to render settings in the background.  The
+    pool is created the first time it is requested.
+
+    :rtype: :class:`multiprocessing.pool.ThreadPool`
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPool(1)
+        return _pool
+
+def submit(func, callback=None):
+    """
+    Call func on the shared thread pool.  If callback is specified, then it
+    is called with the result of func on the same pool thread.  Callbacks
+    are not passed to the pool itself, because the pool calls them on its
+    result handler thread, which an exception from the callback would kill,
+    breaking every later request in the process.  Instead an exception from
+    func or from the callback is raised by the get() method of the result.
+
+    :param func: The function to call, with no arguments.
+    :type func: callable
+    :param callback: If specified, called with the result of func.
+    :type callback: callable
+    :rtype: :class:`multiprocessing.pool.AsyncResult`
+    """
+    if callback is None:
+        return get_pool().apply_async(func)
+    def call():
+        result = func()
+        callback(result)
+        return result
+    return get_pool().apply_async(call)
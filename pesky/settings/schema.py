@@ -0,0 +1,184 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import os
+
+from pesky.settings.units import parse_timedelta, parse_size, parse_percent, parse_bool
+from pesky.settings.errors import ConfigureError
+
+def _parse_str(string):
+    return string.strip()
+
+def _parse_path(string):
+    return os.path.normpath(os.path.abspath(string))
+
+# coercion functions for the named field types
+FIELD_TYPES = {
+    'str': _parse_str,
+    'int': int,
+    'float': float,
+    'bool': parse_bool,
+    'path': _parse_path,
+    'percent': parse_percent,
+    'timedelta': parse_timedelta,
+    'size': parse_size,
+    }
+
+class Field(object):
+    """
+    The declaration of a single setting in a :class:`Schema`.
+    """
+    def __init__(self, path, type, default, required, minimum, maximum, recurring):
+        self.path = path
+        self.type = type
+        self.default = default
+        self.required = required
+        self.minimum = minimum
+        self.maximum = maximum
+        self.recurring = recurring
+
+class Schema(object):
+    """
+    A declarative description of the settings of an application.  Each field
+    maps a path in the :class:`Namespace` to a type, an optional default, and
+    optional bounds.  The schema is compiled once into a validation plan, and
+    the plan coerces and checks every field in a single pass over the
+    namespace, returning the results as :class:`TypedSettings`.
+    """
+    def __init__(self):
+        self._fields = []
+        self._paths = set()
+        self._plan = None
+
+    def add_field(self, path, type='str', default=None, required=False,
+                  minimum=None, maximum=None, recurring=False):
+        """
+        Declare a setting.
+
+        :param path: The path of the setting in the namespace.
+        :type path: str
+        :param type: One of the names in FIELD_TYPES, or a callable which
+          coerces a string into the value.
+        :type type: str or callable
+        :param default: The value if the setting is not present.  The default
+          is not coerced or checked against the bounds.
+        :param required: If True, then the setting must be present.
+        :type required: bool
+        :param minimum: If specified, the smallest value allowed.
+        :param maximum: If specified, the largest value allowed.
+        :param recurring: If True, then the value is the list of all values
+          of the setting, otherwise it is the first value, which is the value
+          with the highest precedence.
+        :type recurring: bool
+        """
+        if path in self._paths:
+            raise ConfigureError("field %s is already defined" % path)
+        if not callable(type) and type not in FIELD_TYPES:
+            raise ConfigureError("field %s has unknown type %s" % (path, type))
+        self._fields.append(Field(path, type, default, required, minimum, maximum, recurring))
+        self._paths.add(path)
+        self._plan = None
+
+    def compile(self):
+        """
+        Compile the fields into a validation plan.  The plan is cached until
+        another field is added.
+
+        :returns: A list of tuples, one per field.
+        :rtype: list
+        """
+        if self._plan is None:
+            plan = []
+            for field in self._fields:
+                coerce = field.type if callable(field.type) else FIELD_TYPES[field.type]
+                plan.append((field.path, coerce, field.default, field.required,
+                    field.minimum, field.maximum, field.recurring))
+            self._plan = plan
+        return self._plan
+
+    def validate(self, namespace):
+        """
+        Coerce and check every field against the namespace.  All fields are
+        checked before an error is raised, so the error describes every
+        invalid setting at once.
+
+        :param namespace: The namespace to validate.
+        :type namespace: :class:`Namespace`
+        :returns: The coerced settings.
+        :rtype: :class:`TypedSettings`
+        :raises ConfigureError: If any field is missing or invalid.
+        """
+        values = {}
+        errors = []
+        get = namespace.get
+        for path,coerce,default,required,minimum,maximum,recurring in self.compile():
+            strings = get(path)
+            if not strings:
+                if required:
+                    errors.append("%s is required" % path)
+                values[path] = default
+                continue
+            if not recurring:
+                strings = strings[:1]
+            try:
+                coerced = [coerce(s) for s in strings]
+            except Exception, e:
+                errors.append("failed to parse %s: %s" % (path, str(e)))
+                continue
+            for value in coerced:
+                if minimum is not None and value < minimum:
+                    errors.append("%s must be at least %s" % (path, minimum))
+                    break
+                if maximum is not None and value > maximum:
+                    errors.append("%s must be at most %s" % (path, maximum))
+                    break
+            values[path] = coerced if recurring else coerced[0]
+        if len(errors) > 0:
+            raise ConfigureError("invalid settings: " + "; ".join(errors))
+        return TypedSettings(values)
+
+class TypedSettings(object):
+    """
+    The coerced settings returned by :meth:`Schema.validate`.  The settings
+    are immutable, so they can be shared between threads without locking.
+    """
+    __slots__ = ('_values',)
+
+    def __init__(self, values):
+        object.__setattr__(self, '_values', values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TypedSettings is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("TypedSettings is immutable")
+
+    def contains(self, path):
+        """
+        Returns True if the specified path is declared in the schema,
+        otherwise False.
+        """
+        return path in self._values
+
+    def get(self, path):
+        """
+        Returns the coerced value of the specified path.  Recurring values
+        are returned as a copy of the list.
+
+        :raises KeyError: If the path is not declared in the schema.
+        """
+        value = self._values[path]
+        if isinstance(value, list):
+            return list(value)
+        return value
+
+    def iteritems(self):
+        """
+        Iterate all (path,value) pairs.
+        """
+        return self._values.iteritems()
+
+    def __len__(self):
+        return len(self._values)
@@ -3,11 +3,65 @@
 # This file is part of Pesky.  Pesky is BSD-licensed software;
 # for copyright information see the LICENSE file.
 
-import os, datetime, shlex, re
+import os, sys, array, functools
 
-from pesky.settings.args import parse_args
+from pesky.settings.args import ArgSpec, split
+from pesky.settings.units import parse_timedelta, parse_size, parse_percent, parse_bool
 from pesky.settings.errors import ConfigureError
 
+_missing = object()
+
+# array typecode and coercion function for each type accepted by get_many
+COLUMN_TYPES = {
+    'int': ('l', int),
+    'float': ('d', float),
+    'bool': ('b', parse_bool),
+    'size': ('l', parse_size),
+    'percent': ('d', parse_percent),
+    }
+
+def _is_global(func):
+    """
+    Returns True if func is reachable by name from its module, which is the
+    case for builtins and module-level functions and classes.
+    """
+    module = sys.modules.get(getattr(func, '__module__', None))
+    return module is not None and getattr(module, getattr(func, '__name__', ''), None) is func
+
+def memoized(getter):
+    """
+    Decorator which caches the value returned by a :class:`Section` getter.
+    The cache is keyed by the option name, the getter, and the coerce
+    function (if one is specified), and is invalidated when the option is
+    modified through :meth:`Section.set` or :meth:`Section.remove`.  Values
+    are only cached if the coerce function is a builtin or is defined at
+    module level, since a lambda or closure created per call would add a
+    cache entry on every call.
+    """
+    kind = getter.__name__
+    @functools.wraps(getter)
+    def wrapper(self, name, default=None, *args, **kwargs):
+        if args:
+            coerce = args[0]
+        else:
+            coerce = kwargs.get('coerce', None)
+        key = (kind, coerce)
+        cached = self._cache.get(name)
+        if cached is not None and key in cached:
+            self.cache_hits += 1
+            value = cached[key]
+        else:
+            self.cache_misses += 1
+            value = getter(self, name, _missing, *args, **kwargs)
+            if coerce is None or _is_global(coerce):
+                self._cache.setdefault(name, {})[key] = value
+        if value is _missing:
+            return default
+        if isinstance(value, list):
+            return list(value)
+        return value
+    return wrapper
+
 class Section(object):
     """
     A group of configuration values which share a common purpose.
@@ -24,7 +78,21 @@ class Section(object):
         self.name = name
         self._options = options
         self._cwd = cwd
+        self._cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def clear_cache(self):
+        """
+        Discard all cached values and reset the cache hit and miss counters.
+        Call this if the underlying options were modified without going
+        through :meth:`set` or :meth:`remove`.
+        """
+        self._cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
 
+    @memoized
     def get_str(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -46,6 +114,7 @@ class Section(object):
             return default
         return s.strip()
 
+    @memoized
     def get_int(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -66,6 +135,7 @@ class Section(object):
             return default
         return self._options.getint(self.name, name)
 
+    @memoized
     def get_bool(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -86,6 +156,7 @@ class Section(object):
             return default
         return self._options.getboolean(self.name, name)
 
+    @memoized
     def get_float(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -106,6 +177,7 @@ class Section(object):
             return default
         return self._options.getfloat(self.name, name)
 
+    @memoized
     def get_path(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -128,6 +200,7 @@ class Section(object):
             return default
         return os.path.normpath(os.path.join(self._cwd, path))
 
+    @memoized
     def get_list(self, name, default=None, coerce=str):
         """
         Returns the configuration value associated with the specified `name`,
@@ -151,13 +224,17 @@ class Section(object):
         if l == None:
             return default
         try:
-            return map(coerce, shlex.split(l))
+            return map(coerce, split(l))
         except Exception, e:
             raise ConfigureError("failed to parse configuration item [%s]=>%s: %s" % (
                 self.name, name, e))
 
     def get_args(self, name, *spec, **kwargs):
         """
+        Returns the configuration value associated with the specified name,
+        split into arguments and validated against the spec.  The spec is
+        either a single :class:`ArgSpec`, or the validators and keyword
+        arguments accepted by :func:`parse_args`.
         """
         default = None
         if 'default' in kwargs:
@@ -165,9 +242,14 @@ class Section(object):
             del kwargs['default']
         if self.name == None or not self._options.has_option(self.name, name):
             return default
-        args = shlex.split(self._options.get(self.name, name))
-        return parse_args(args, *spec, **kwargs)
+        args = split(self._options.get(self.name, name))
+        if len(spec) == 1 and isinstance(spec[0], ArgSpec):
+            argspec = spec[0]
+        else:
+            argspec = ArgSpec(*spec, **kwargs)
+        return argspec(args)
 
+    @memoized
     def get_timedelta(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -187,31 +269,13 @@ class Section(object):
         string = self._options.get(self.name, name)
         if string == None:
             return default
-        string = string.strip()
-        tokens = [t for t in string.split(' ') if t != '']
         try:
-            if len(tokens) < 2:
-                raise Exception("invalid timedelta " + string)
-            value = int(tokens[0])
-            units = tokens[1].lower()
-            if units in ('micro', 'micros', 'microsecond', 'microseconds'):
-                return datetime.timedelta(microseconds=value)
-            if units in ('milli', 'millis', 'millisecond', 'milliseconds'):
-                return datetime.timedelta(milliseconds=value)
-            if units in ('second', 'seconds'):
-                return datetime.timedelta(seconds=value)
-            if units in ('minute', 'minutes'):
-                return datetime.timedelta(minutes=value)
-            if units in ('hour', 'hours'):
-                return datetime.timedelta(hours=value)
-            if units in ('day', 'days'):
-                return datetime.timedelta(days=value)
-            if units in ('week', 'weeks'):
-                return datetime.timedelta(weeks=value)
+            return parse_timedelta(string)
         except Exception, e:
             raise ConfigureError("failed to parse configuration item [%s]=>%s: %s" % (
                 self.name, name, str(e)))
 
+    @memoized
     def get_size(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -232,27 +296,13 @@ class Section(object):
         string = self._options.get(self.name, name)
         if string == None:
             return default
-        string = string.strip()
-        tokens = [t for t in string.split(' ') if t != '']
         try:
-            if len(tokens) < 2:
-                raise Exception("invalid size " + string)
-            value = long(tokens[0])
-            units = tokens[1].lower()
-            if units in ('kb', 'kilo', 'kilobyte', 'kilobytes'):
-                return value * 1024
-            if units in ('mb', 'mega', 'megabyte', 'megabytes'):
-                return value * 1024 * 1024
-            if units in ('gb', 'giga', 'gigabyte', 'gigabytes'):
-                return value * 1024 * 1024 * 1024
-            if units in ('tb', 'tera', 'terabyte', 'terabytes'):
-                return value * 1024 * 1024 * 1024 * 1024
-            if units in ('pb', 'peta', 'petabyte', 'petabytes'):
-                return value * 1024 * 1024 * 1024 * 1024 * 1024
+            return parse_size(string)
         except Exception, e:
             raise ConfigureError("failed to parse configuration item [%s]=>%s: %s" % (
                 self.name, name, str(e)))
 
+    @memoized
     def get_percent(self, name, default=None):
         """
         Returns the configuration value associated with the specified name,
@@ -273,16 +323,102 @@ class Section(object):
         string = self._options.get(self.name, name)
         if string == None:
             return default
-        string = string.strip()
         try:
-            m = re.match(r'(0\.\d+|[1-9]\d*\.\d+|\d+)\s*%', string)
-            if m is None:
-                raise Exception("invalid percentage " + string)
-            return float(m.group(1)) / 100.0
+            return parse_percent(string)
         except Exception, e:
             raise ConfigureError("failed to parse configuration item [%s]=>%s: %s" % (
                 self.name, name, str(e)))
 
+    def get_many(self, names, type, default=None, numpy=False):
+        """
+        Returns the configuration values associated with the specified names,
+        coerced in a single pass into a compact array.  The options of the
+        section are read once, and every invalid value is reported in a single
+        ConfigureError.
+
+        :param names: The configuration setting names.
+        :type names: [str]
+        :param type: One of the names in COLUMN_TYPES.
+        :type type: str
+        :param default: The value to use for a name which is not found.  If
+          None, then a missing name is an error.
+        :param numpy: If True, return a numpy array sharing the memory of
+          the array.  numpy must be installed.
+        :type numpy: bool
+        :returns: The coerced values, in the same order as `names`.
+        :rtype: :class:`array.array`
+        """
+        return self._coerce_many(self._raw_options(), names, type, default, numpy)
+
+    def get_column(self, prefix, type, numpy=False):
+        """
+        Returns the configuration values whose names start with the specified
+        prefix, coerced in a single pass into a compact array.
+
+        :param prefix: The name prefix, for example 'shard_'.
+        :type prefix: str
+        :param type: One of the names in COLUMN_TYPES.
+        :type type: str
+        :param numpy: If True, return a numpy array.  numpy must be installed.
+        :type numpy: bool
+        :returns: A tuple containing the sorted list of matching names, and
+          the array of their coerced values.
+        :rtype: ([str], :class:`array.array`)
+        """
+        prefix = self._options.optionxform(prefix)
+        raw = self._raw_options()
+        names = sorted([name for name,value in raw.iteritems()
+            if name.startswith(prefix) and value is not None])
+        return names, self._coerce_many(raw, names, type, None, numpy)
+
+    def _coerce_many(self, raw, names, type, default, numpy):
+        """
+        Coerce the raw values of the specified names into an array.
+        """
+        try:
+            typecode,coerce = COLUMN_TYPES[type]
+        except KeyError:
+            raise ConfigureError("unknown column type %s" % type)
+        optionxform = self._options.optionxform
+        values = []
+        errors = []
+        for name in names:
+            string = raw.get(optionxform(name))
+            if string is None:
+                if default is None:
+                    errors.append("%s is missing" % name)
+                else:
+                    values.append(default)
+                continue
+            try:
+                values.append(coerce(string))
+            except Exception, e:
+                errors.append("%s: %s" % (name, str(e)))
+        if len(errors) > 0:
+            raise ConfigureError("failed to parse configuration items in [%s]: %s" % (
+                self.name, "; ".join(errors)))
+        try:
+            column = array.array(typecode, values)
+        except (OverflowError, TypeError), e:
+            raise ConfigureError("failed to parse configuration items in [%s]: %s" % (
+                self.name, str(e)))
+        if numpy:
+            try:
+                import numpy
+            except ImportError:
+                raise ConfigureError("numpy is not installed")
+            return numpy.frombuffer(column, dtype=typecode)
+        return column
+
+    def _raw_options(self):
+        """
+        Returns a dict mapping each option name in the section to its raw
+        value.  Removed options map to None.
+        """
+        if self.name == None or not self._options.has_section(self.name):
+            return {}
+        return dict(self._options.items(self.name))
+
     def set(self, name, value):
         """
         Modify the configuration setting.  value must be a string.
@@ -291,6 +427,7 @@ class Section(object):
             raise ConfigureError("failed to modify configuration item [%s]=>%s: value is not a string" % (
             self.name, name))
         self._options.set(self.name, name, value)
+        self._invalidate(name)
 
     def remove(self, name):
         """
@@ -298,3 +435,43 @@ class Section(object):
         value to None.
         """
         self._options.set(self.name, name, None)
+        self._invalidate(name)
+
+    def _invalidate(self, name):
+        """
+        Discard the cached values for the specified name.  Option names are
+        case-insensitive, so every cached spelling of the name is discarded.
+        """
+        optionxform = self._options.optionxform
+        option = optionxform(name)
+        for cached in [n for n in self._cache if optionxform(n) == option]:
+            del self._cache[cached]
+
+class LazySection(Section):
+    """
+    A :class:`Section` whose options are not loaded until they are first
+    needed.  Values which are cached do not require the options, so the
+    loader is only called on the first cache miss, and its result is kept
+    for the lifetime of the section.
+
+    :param name: The name of the section.
+    :type name: str
+    :param load: A callable which returns the options when called.
+    :type load: callable
+    :param cwd: the current working directory
+    :type cwd: str
+    """
+
+    def __init__(self, name, load, cwd):
+        self._load = load
+        Section.__init__(self, name, None, cwd)
+
+    def _get_options(self):
+        if self._loaded is None:
+            self._loaded = self._load()
+        return self._loaded
+
+    def _set_options(self, options):
+        self._loaded = options
+
+    _options = property(_get_options, _set_options)
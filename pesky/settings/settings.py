@@ -3,11 +3,13 @@
 # This file is part of Pesky.  Pesky is BSD-licensed software;
 # for copyright information see the LICENSE file.
 
-import os, sys, getopt, datetime
-from ConfigParser import RawConfigParser
+import os, sys
 
-from pesky.settings.parser import Parser
+from pesky.settings.optionparser import OptionParser
+from pesky.settings.environmentparser import EnvironmentParser
+from pesky.settings.configparser import ConfigParser
 from pesky.settings.namespace import Namespace
+from pesky.settings.pool import submit
 from pesky.settings.errors import ConfigureError
 
 class Settings(object):
@@ -38,30 +40,63 @@ class Settings(object):
         # initialize the config parser
         self.config = ConfigParser()
         self.config.set_path(os.path.join('/', 'etc', appgroup, appname + '.conf'))
+        self.config.set_directory(os.path.join('/', 'etc', appgroup, appname + '.conf.d'))
         self.config.set_required(False)
+        self.schema = None
+
+    def set_schema(self, schema):
+        """
+        Validate the parsed settings against the specified schema.
+
+        :param schema: The schema, or None to disable validation.
+        :type schema: :class:`Schema`
+        """
+        self.schema = schema
 
     def parse(self):
         """
         Load configuration from environment, command-line arguments, and
-        config file, and merge them together.
+        config file, and merge them together.  If a schema was set, then the
+        merged settings are validated, and the coerced settings are stored in
+        the typed attribute of the namespace.
 
         :returns: A :class:`Namespace` object with the parsed settings
         :rtype: :class:`Namespace`
+        :raises ConfigureError: If the settings could not be parsed, or are
+          invalid according to the schema.
         """
         ns = Namespace()
-        strategy = AppendStrategy()
         # render options settings, then merge them into the namespace
         options = self.options.render()
-        ns.merge_with(options, strategy)
+        ns.merge(options)
         # render environment settings, then merge them into the namespace
         environ = self.environ.render()
-        ns.merge_with(environ, strategy)
-        # if config file was specified by environ or options, then use it
-        config_path = ns.get_path('pesky.config.file')
+        ns.merge(environ)
+        # if config file was specified by options or environ, then use it
+        config_path = ns.get('pesky.config.file')
         if config_path is not None:
-            self.config.set_path(config_path)
+            self.config.set_path(config_path[0])
             self.config.set_required(True)
+            # don't merge the system-wide fragments into an explicit config
+            self.config.set_directory(None)
         # render config file settings, then merge them into the namespace
         config = self.config.render()
-        ns.merge_with(config, strategy)
+        ns.merge(config)
+        if self.schema is not None:
+            ns.typed = self.schema.validate(ns)
         return ns
+
+    def parse_async(self, callback=None):
+        """
+        Parse the settings on a background thread, so that the caller (for
+        example an event loop) is not blocked on configuration file I/O.
+
+        :param callback: If specified, called with the :class:`Namespace`
+          on the background thread once parsing succeeds.
+        :type callback: callable
+        :returns: The pending result, whose get() method returns the
+          :class:`Namespace` or raises the parsing error or the error raised
+          by the callback.
+        :rtype: :class:`multiprocessing.pool.AsyncResult`
+        """
+        return submit(self.parse, callback)
@@ -8,14 +8,77 @@ class Store(object):
     """
     def __init__(self):
         self._values = {}
+        # trie of dotted path components.  each node is a dict mapping a
+        # component to its child node, and the None key of a node holds the
+        # full name if the path up to that node exists in the store.
+        self._index = {}
 
     def append(self, name, value):
         """
-        Appends the value to the specified name.
+        Appends the value to the specified name.  The list of values is
+        created with setdefault, so concurrent appends to a new name can't
+        replace each other's list, and the name is indexed after the value
+        is appended.  A store is only safe for concurrent appends; reading a
+        store while it is modified may fail, so threads which read shared
+        settings should use a :class:`SharedNamespace`.
         """
-        curr = self._values.get(name, [])
-        curr.append(value)
-        self._values[name] = curr
+        curr = self._values.get(name)
+        if curr is None:
+            curr = self._values.setdefault(name, [])
+            curr.append(value)
+            self._insert(name)
+        else:
+            curr.append(value)
+
+    def set(self, name, values):
+        """
+        Replaces the values of the specified name.
+        """
+        if name not in self._values:
+            self._insert(name)
+        self._values[name] = list(values)
+
+    def remove(self, name):
+        """
+        Removes the specified name.  Does nothing if the name doesn't exist.
+        """
+        if self._values.pop(name, None) is None:
+            return
+        # walk down the index, then prune nodes which have become empty
+        nodes = []
+        node = self._index
+        for component in name.split('.'):
+            nodes.append((node, component))
+            node = node[component]
+        del node[None]
+        for parent,component in reversed(nodes):
+            if len(parent[component]) > 0:
+                break
+            del parent[component]
+
+    def _insert(self, name):
+        """
+        Add the specified name to the path index.
+        """
+        node = self._index
+        for component in name.split('.'):
+            node = node.setdefault(component, {})
+        node[None] = name
+
+    def _lookup(self, prefix):
+        """
+        Returns the index node for the specified prefix, or None if no name
+        in the store starts with the prefix.
+        """
+        node = self._index
+        prefix = prefix.rstrip('.')
+        if prefix == '':
+            return node
+        for component in prefix.split('.'):
+            node = node.get(component)
+            if node is None:
+                return None
+        return node
 
     def contains(self, name):
         """
@@ -33,3 +96,37 @@ class Store(object):
         Iterate all (name,value) pairs.
         """
         return self._values.iteritems()
+
+    def diff(self, other):
+        """
+        Compare the store with other.  Returns a tuple of three sets: the
+        names which exist only in other, the names which exist only in this
+        store, and the names whose values differ between the two stores.
+        """
+        values = self._values
+        others = other._values
+        added = set([name for name in others if name not in values])
+        removed = set([name for name in values if name not in others])
+        changed = set([name for name,curr in values.iteritems()
+            if name in others and others[name] != curr])
+        return added, removed, changed
+
+    def iter_prefix(self, prefix):
+        """
+        Iterate all (name,value) pairs where name is equal to prefix or is a
+        descendent of prefix in the dotted path hierarchy.  The cost is
+        proportional to the number of components in prefix plus the number
+        of matching names.
+        """
+        node = self._lookup(prefix)
+        if node is None:
+            return
+        values = self._values
+        stack = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            for component,child in node.iteritems():
+                if component is None:
+                    yield child, values[child]
+                else:
+                    stack.append(child)
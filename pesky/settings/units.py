@@ -0,0 +1,175 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import datetime, re
+
+from pesky.settings.errors import ConfigureError
+
+def _units(table):
+    """
+    Expand a list of (aliases, multiplier) pairs into a lookup table.
+    """
+    units = {}
+    for aliases,multiplier in table:
+        for alias in aliases:
+            units[alias] = multiplier
+    return units
+
+# multipliers are expressed in microseconds
+TIMEDELTA_UNITS = _units([
+    (('us', 'micro', 'micros', 'microsecond', 'microseconds'), 1),
+    (('ms', 'milli', 'millis', 'millisecond', 'milliseconds'), 1000),
+    (('s', 'sec', 'secs', 'second', 'seconds'), 1000 * 1000),
+    (('m', 'min', 'mins', 'minute', 'minutes'), 60 * 1000 * 1000),
+    (('h', 'hr', 'hrs', 'hour', 'hours'), 60 * 60 * 1000 * 1000),
+    (('d', 'day', 'days'), 24 * 60 * 60 * 1000 * 1000),
+    (('w', 'week', 'weeks'), 7 * 24 * 60 * 60 * 1000 * 1000),
+    ])
+
+# multipliers are expressed in bytes
+SIZE_UNITS = _units([
+    (('b', 'byte', 'bytes'), 1),
+    (('k', 'kb', 'kilo', 'kilobyte', 'kilobytes'), 1024),
+    (('m', 'mb', 'mega', 'megabyte', 'megabytes'), 1024 ** 2),
+    (('g', 'gb', 'giga', 'gigabyte', 'gigabytes'), 1024 ** 3),
+    (('t', 'tb', 'tera', 'terabyte', 'terabytes'), 1024 ** 4),
+    (('p', 'pb', 'peta', 'petabyte', 'petabytes'), 1024 ** 5),
+    ])
+
+# values accepted as booleans, as in ConfigParser.RawConfigParser.getboolean
+BOOLEAN_STATES = {
+    '1': True, 'yes': True, 'true': True, 'on': True,
+    '0': False, 'no': False, 'false': False, 'off': False,
+    }
+
+# a quantity is an optionally signed number immediately or whitespace-separated
+# followed by a unit
+_quantity = re.compile(r'\s*([+-]?)(\d+(?:\.\d+)?|\.\d+)\s*([a-zA-Z]+)')
+
+_percent = re.compile(r'(0\.\d+|[1-9]\d*\.\d+|\d+)\s*%')
+
+def _parse_units(string, units, kind):
+    """
+    Parse a compact, fractional, compound or negative quantity such as '250ms',
+    '1.5 GB', '1h 30m' or '-5 seconds' in a single pass, and return the total
+    as a multiple of the base unit in the `units` table.  Fractional numbers
+    are computed exactly and each quantity is rounded to the nearest base unit.
+    """
+    total = 0
+    position = 0
+    end = len(string.rstrip())
+    match = _quantity.match
+    while position < end:
+        m = match(string, position)
+        if m is None:
+            raise ConfigureError("invalid %s %s" % (kind, string))
+        sign,number,unit = m.groups()
+        try:
+            multiplier = units[unit.lower()]
+        except KeyError:
+            raise ConfigureError("invalid %s %s: unknown units %s" % (kind, string, unit))
+        if '.' in number:
+            whole,fraction = number.split('.')
+            scale = 10 ** len(fraction)
+            scaled = (int(whole or '0') * scale + int(fraction)) * multiplier
+            quantity = (2 * scaled + scale) // (2 * scale)
+        else:
+            quantity = int(number) * multiplier
+        if sign == '-':
+            total -= quantity
+        else:
+            total += quantity
+        position = m.end()
+    if position == 0:
+        raise ConfigureError("invalid %s %s" % (kind, string))
+    return total
+
+def parse_timedelta(string):
+    """
+    Parse the specified string into a timedelta.  The string consists of one or
+    more quantities, each of which is a (possibly fractional) number followed by
+    a unit, for example '30 seconds', '250ms' or '1h30m'.
+
+    :param string: The string to parse.
+    :type string: str
+    :returns: The parsed timedelta.
+    :rtype: :class:`datetime.timedelta`
+    :raises ConfigureError: If the string is not a valid timedelta.
+    """
+    micros = _parse_units(string, TIMEDELTA_UNITS, 'timedelta')
+    return datetime.timedelta(microseconds=long(micros))
+
+def parse_size(string):
+    """
+    Parse the specified string into a size in bytes.  The string consists of
+    one or more quantities, each of which is a (possibly fractional) number
+    followed by a unit, for example '512 MB', '1.5GB' or '1g 512m'.
+
+    :param string: The string to parse.
+    :type string: str
+    :returns: The parsed size in bytes.
+    :rtype: long
+    :raises ConfigureError: If the string is not a valid size.
+    """
+    return long(_parse_units(string, SIZE_UNITS, 'size'))
+
+def parse_percent(string):
+    """
+    Parse the specified string, for example '75%' or '12.5 %', into a float
+    representing the fraction of one.
+
+    :param string: The string to parse.
+    :type string: str
+    :returns: The parsed percentage.
+    :rtype: float
+    :raises ConfigureError: If the string is not a valid percentage.
+    """
+    m = _percent.match(string.strip())
+    if m is None:
+        raise ConfigureError("invalid percentage " + string)
+    return float(m.group(1)) / 100.0
+
+def parse_bool(string):
+    """
+    Parse the specified string into a bool.  The accepted strings are the
+    same as for :meth:`ConfigParser.RawConfigParser.getboolean`.
+
+    :param string: The string to parse.
+    :type string: str
+    :returns: The parsed bool.
+    :rtype: bool
+    :raises ConfigureError: If the string is not a valid bool.
+    """
+    try:
+        return BOOLEAN_STATES[string.strip().lower()]
+    except KeyError:
+        raise ConfigureError("invalid bool " + string)
+
+def parse_durations(strings):
+    """
+    Parse each string in the specified sequence into a timedelta.
+
+    :param strings: The strings to parse.
+    :type strings: [str]
+    :returns: A list of parsed timedeltas, in the same order as `strings`.
+    :rtype: [:class:`datetime.timedelta`]
+    :raises ConfigureError: If any string is not a valid timedelta.
+    """
+    timedelta = datetime.timedelta
+    units = TIMEDELTA_UNITS
+    return [timedelta(microseconds=long(_parse_units(s, units, 'timedelta'))) for s in strings]
+
+def parse_sizes(strings):
+    """
+    Parse each string in the specified sequence into a size in bytes.
+
+    :param strings: The strings to parse.
+    :type strings: [str]
+    :returns: A list of parsed sizes, in the same order as `strings`.
+    :rtype: [long]
+    :raises ConfigureError: If any string is not a valid size.
+    """
+    units = SIZE_UNITS
+    return [long(_parse_units(s, units, 'size')) for s in strings]
@@ -0,0 +1,293 @@
+# Copyright 2010-2014 Michael Frank <msfrank@syntaxjockey.com>
+#
+# This file is part of Pesky.  Pesky is BSD-licensed software;
+# for copyright information see the LICENSE file.
+
+import os, glob, select, struct, threading, Queue, ctypes, ctypes.util
+from ConfigParser import Error as ConfigParserError
+
+from pesky.settings.errors import ConfigureError
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+class Inotify(object):
+    """
+    Watches a directory for changes to a single file using the Linux inotify
+    interface.  The directory is watched rather than the file itself, so that
+    files which are replaced by rename are detected.
+
+    :param path: The path of the file to watch.
+    :type path: str
+    :raises EnvironmentError: If inotify is not available.
+    """
+    _event = struct.Struct('iIII')
+
+    def __init__(self, path):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            inotify_init = libc.inotify_init
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            raise EnvironmentError("inotify is not available")
+        self._name = os.path.basename(path)
+        self._fd = inotify_init()
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise EnvironmentError(errno, os.strerror(errno))
+        mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if inotify_add_watch(self._fd, os.path.dirname(os.path.abspath(path)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise EnvironmentError(errno, os.strerror(errno))
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds for the file to change.  Returns True if
+        the file changed, otherwise False.
+        """
+        readable,_,_ = select.select([self._fd], [], [], timeout)
+        if len(readable) == 0:
+            return False
+        buf = os.read(self._fd, 64 * 1024)
+        changed = False
+        offset = 0
+        while offset < len(buf):
+            wd,mask,cookie,length = self._event.unpack_from(buf, offset)
+            offset += self._event.size
+            name = buf[offset:offset + length].rstrip('\0')
+            offset += length
+            if name == self._name:
+                changed = True
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+class ConfigWatcher(object):
+    """
+    Watches the configuration file of a :class:`ConfigParser`, and when the
+    file changes, re-renders only that file and notifies subscribers of the
+    changed names.  Changes are detected with inotify if it is available,
+    otherwise by polling the mtime and size of the file.  Fragments in the
+    directory of :meth:`ConfigParser.set_directory` are always polled, so
+    adding, removing or modifying a fragment is detected within interval
+    seconds.
+
+    :param parser: The config parser to watch.
+    :type parser: :class:`ConfigParser`
+    :param interval: The polling interval in seconds.
+    :type interval: float
+    :param use_inotify: If False, then always poll.
+    :type use_inotify: bool
+    """
+    def __init__(self, parser, interval=1.0, use_inotify=True):
+        self.parser = parser
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.store = None
+        self.error = None
+        self._stat = None
+        self._subscribers = []
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def subscribe(self, callback):
+        """
+        Register callback to be called when the configuration changes.  The
+        callback is called with the new :class:`Store` and the sets of added,
+        removed and changed names.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Unregister a callback previously passed to :meth:`subscribe`.
+        """
+        self._subscribers.remove(callback)
+
+    def iter_changes(self, timeout=None):
+        """
+        Returns an iterator over the changes to the configuration.  Each
+        change is a tuple containing the new :class:`Store` and the sets of
+        added, removed and changed names.  Iteration blocks until the next
+        change, and stops if no change arrives within timeout seconds, so it
+        is meant for worker threads; :meth:`ChangeIterator.poll` returns the
+        next change without blocking.  The
+        iterator is subscribed immediately, so changes which happen before
+        the first call to next() are not lost.
+
+        :param timeout: The number of seconds to wait for each change, or
+          None to wait forever.
+        :type timeout: float
+        :rtype: :class:`ChangeIterator`
+        """
+        return ChangeIterator(self, timeout)
+
+    def _stat_path(self):
+        """
+        Returns the identity, mtime and size of the configuration file and
+        of each configuration fragment, if the parser has a fragments
+        directory.
+        """
+        paths = []
+        if self.parser.path is not None:
+            paths.append(self.parser.path)
+        if self.parser.directory is not None:
+            paths.extend(sorted(glob.glob(os.path.join(self.parser.directory, self.parser.pattern))))
+        stats = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stats.append((path, st.st_ino, st.st_mtime, st.st_size))
+            except EnvironmentError:
+                stats.append((path, None))
+        return tuple(stats)
+
+    def check(self, force=False):
+        """
+        Check whether the configuration file has changed, and if so re-render
+        it and notify subscribers of the changed names.  The first call only
+        records the current configuration.  Returns True if subscribers were
+        notified, otherwise False.  An exception raised by a subscriber is
+        stored in the error attribute, and does not prevent the remaining
+        subscribers from being notified.
+
+        :param force: If True, then re-render even if the mtime and size of
+          the file are unchanged.
+        :type force: bool
+        :raises ConfigureError: If the configuration could not be rendered.
+        """
+        stat = self._stat_path()
+        if self.store is not None and stat == self._stat and not force:
+            return False
+        store = self.parser.render()
+        self._stat = stat
+        self.error = None
+        if self.store is None:
+            self.store = store
+            return False
+        added,removed,changed = self.store.diff(store)
+        self.store = store
+        if len(added) == 0 and len(removed) == 0 and len(changed) == 0:
+            return False
+        for callback in list(self._subscribers):
+            try:
+                callback(store, added, removed, changed)
+            except Exception as e:
+                self.error = e
+        return True
+
+    def start(self):
+        """
+        Start watching the configuration file in a background thread.  If the
+        parser has no configuration file, only a fragments directory, then
+        the fragments are polled.
+        """
+        if self._thread is not None:
+            raise RuntimeError("watcher is already running")
+        self.check()
+        inotify = None
+        if self.use_inotify and self.parser.path is not None:
+            try:
+                inotify = Inotify(self.parser.path)
+            except EnvironmentError:
+                pass
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(inotify,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop watching the configuration file.
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, inotify):
+        try:
+            while not self._stopping.is_set():
+                if inotify is not None:
+                    force = inotify.wait(self.interval)
+                else:
+                    self._stopping.wait(self.interval)
+                    force = False
+                if self._stopping.is_set():
+                    break
+                try:
+                    self.check(force)
+                except (ConfigureError, ConfigParserError, EnvironmentError) as e:
+                    # keep the previous configuration until the file is fixed
+                    self.error = e
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+class ChangeIterator(object):
+    """
+    A blocking iterator over the changes detected by a :class:`ConfigWatcher`.
+    Changes are queued from the moment the iterator is created until it is
+    closed.  Iteration blocks the calling thread, so it is meant for worker
+    threads; an event loop should call :meth:`poll` instead.
+
+    :param watcher: The watcher.
+    :type watcher: :class:`ConfigWatcher`
+    :param timeout: The number of seconds to wait for each change, or None
+      to wait forever.
+    :type timeout: float
+    """
+    def __init__(self, watcher, timeout=None):
+        self._watcher = watcher
+        self._timeout = timeout
+        self._changes = Queue.Queue()
+        watcher.subscribe(self._put)
+
+    def _put(self, store, added, removed, changed):
+        self._changes.put((store, added, removed, changed))
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """
+        Returns the next change.
+
+        :raises StopIteration: If the iterator is closed, or no change
+          arrived within the timeout.
+        """
+        if self._watcher is None:
+            raise StopIteration()
+        try:
+            return self._changes.get(True, self._timeout)
+        except Queue.Empty:
+            raise StopIteration()
+
+    def poll(self):
+        """
+        Returns the next change without blocking, or None if no change is
+        queued or the iterator is closed.
+        """
+        if self._watcher is None:
+            return None
+        try:
+            return self._changes.get_nowait()
+        except Queue.Empty:
+            return None
+
+    def close(self):
+        """
+        Unsubscribe from the watcher.  Changes which were already queued are
+        discarded.
+        """
+        if self._watcher is not None:
+            self._watcher.unsubscribe(self._put)
+            self._watcher = None
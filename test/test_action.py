@@ -0,0 +1,45 @@
+
+import sys, unittest
+from pesky.settings.action import ActionMap, Action, NOACTION
+from pesky.settings.optionparser import Option
+from pesky.settings import ConfigureError
+
+class TestActionMap(unittest.TestCase):
+
+    def setUp(self):
+        self.argv = sys.argv
+
+    def tearDown(self):
+        sys.argv = self.argv
+
+    def make_actions(self):
+        def callback(ns):
+            return ns.get('fooprogram.name')
+        name = Option('n', 'name', 'fooprogram.name', None, None, False)
+        return ActionMap('fooprogram', 'foogroup', '1.0', 'description', 'usage', actions=[
+            Action('server', callback=NOACTION, actions=[
+                Action('start', callback=callback, options=[name], aliases=['up']),
+                Action('stop', callback=lambda ns: 'stopped'),
+                ]),
+            ])
+
+    def test_parse(self):
+        "ActionMap should call the callback of the selected action"
+        actions = self.make_actions()
+        sys.argv = ['fooprogram', 'server', 'start', '-n', 'foo']
+        self.assertEqual(actions.parse(), ['foo'])
+
+    def test_parse_alias(self):
+        "ActionMap should resolve aliases and prefixes to actions"
+        actions = self.make_actions()
+        sys.argv = ['fooprogram', 'serv', 'up', '--name', 'bar']
+        self.assertEqual(actions.parse(), ['bar'])
+        sys.argv = ['fooprogram', 'server', 'sto']
+        self.assertEqual(actions.parse(), 'stopped')
+
+    def test_parse_no_action(self):
+        "ActionMap should raise ConfigureError if the selected action has no callback"
+        actions = ActionMap('fooprogram', 'foogroup', '1.0', 'description', 'usage', actions=[
+            Action('server', callback=NOACTION)])
+        sys.argv = ['fooprogram', 'server']
+        self.assertRaises(ConfigureError, actions.parse)
@@ -0,0 +1,68 @@
+
+import random, shlex, unittest
+from pesky.settings import args
+from pesky.settings.args import split, parse_args, ArgSpec
+from pesky.settings import ConfigureError
+
+class TestArgs(unittest.TestCase):
+
+    def test_split(self):
+        "split should split words the same as shlex.split"
+        self.assertEqual(split(' a  b\tc\n'), ['a', 'b', 'c'])
+        self.assertEqual(split(''), [])
+        self.assertEqual(split('a "b c" d\\ e'), ['a', 'b c', 'd e'])
+        self.assertEqual(split("a#b 'c'"), ['a#b', 'c'])
+        self.assertRaises(ValueError, split, 'a "b')
+        rand = random.Random(0)
+        for i in range(1000):
+            string = ''.join([rand.choice('ab #\t\n\'"\\') for j in range(rand.randint(0, 12))])
+            try:
+                expected = shlex.split(string)
+            except ValueError:
+                self.assertRaises(ValueError, split, string)
+            else:
+                self.assertEqual(split(string), expected)
+
+    def test_split_cache(self):
+        "split should cache results and bound the cache size"
+        words = split('x y z')
+        words.append('w')
+        self.assertEqual(split('x y z'), ['x', 'y', 'z'])
+        for i in range(args.SPLIT_CACHE_SIZE * 2):
+            split('host%i' % i)
+        self.assertTrue(len(args._split_cache) <= args.SPLIT_CACHE_SIZE)
+
+    def test_argspec(self):
+        "ArgSpec should validate arguments against the spec"
+        spec = ArgSpec(int, float, str, minimum=1, maximum=4, names=['count', 'ratio'])
+        self.assertEqual(spec(['1', '0.5', 'x', 'y']), (1, 0.5, 'x', 'y'))
+        self.assertEqual(spec(['1']), (1,))
+        self.assertEqual(parse_args(['1', '0.5'], int, float), (1, 0.5))
+        self.assertRaises(ConfigureError, spec, [])
+        self.assertRaises(ConfigureError, spec, ['1', '2', '3', '4', '5'])
+        try:
+            spec(['1', 'half'])
+        except ConfigureError, e:
+            self.assertTrue(str(e).startswith('failed to parse argument ratio: '))
+        else:
+            self.fail("ConfigureError was not raised")
+        try:
+            parse_args(['1'], int, int)
+        except ConfigureError, e:
+            self.assertEqual(str(e), 'missing argument')
+        else:
+            self.fail("ConfigureError was not raised")
+
+    def test_argspec_validate_many(self):
+        "ArgSpec.validate_many should report every invalid argument list at once"
+        spec = ArgSpec(int, int)
+        self.assertEqual(spec.validate_many([['1', '2'], ['3', '4']]), [(1, 2), (3, 4)])
+        try:
+            spec.validate_many([['1', '2'], ['x', '4'], ['5']])
+        except ConfigureError, e:
+            message = str(e)
+        else:
+            self.fail("ConfigureError was not raised")
+        self.assertTrue('arguments 1: failed to parse argument' in message)
+        self.assertTrue('arguments 2: missing argument' in message)
+        self.assertFalse('arguments 0' in message)
@@ -0,0 +1,79 @@
+
+import os, sys, shutil, tempfile, subprocess, unittest
+from pesky.settings.optionparser import OptionParser
+from pesky.settings.completion import completion_table, complete, generate_bash, generate_zsh, write_completion_index, write_completion_script
+
+class TestCompletion(unittest.TestCase):
+
+    def make_parser(self):
+        parser = OptionParser()
+        parser.set_appname("fooprogram")
+        parser.add_option('c', 'config-file', 'fooprogram.config.file')
+        parser.add_switch('v', 'verbose', 'fooprogram.verbose')
+        db = parser.add_subcommand("db", aliases=['database'])
+        db.add_longswitch('force', 'fooprogram.db.force')
+        db.add_subcommand("migrate")
+        db.add_subcommand("dump")
+        parser.add_subcommand("status")
+        return parser
+
+    def test_completion_table(self):
+        "completion_table should contain the options and subcommands of each parser"
+        table = completion_table(self.make_parser())
+        self.assertEqual(sorted(table.keys()), ['', 'db', 'db dump', 'db migrate', 'status'])
+        words,routes,hasarg = table['']
+        self.assertEqual(words, sorted(['--help', '--version', '-c', '--config-file',
+            '-v', '--verbose', 'db', 'database', 'status']))
+        self.assertEqual(routes, {'db': 'db', 'database': 'db', 'status': 'status',
+            'd': 'db', 'da': 'db', 'dat': 'db', 'data': 'db', 'datab': 'db', 'databa': 'db',
+            'databas': 'db', 's': 'status', 'st': 'status', 'sta': 'status', 'stat': 'status',
+            'statu': 'status'})
+        self.assertEqual(hasarg, ['--config-file', '-c'])
+
+    def test_complete(self):
+        "complete should return completions for the current command path"
+        table = completion_table(self.make_parser())
+        self.assertEqual(complete(table, [], 'd'), ['database', 'db'])
+        self.assertEqual(complete(table, ['-c', 'db'], 's'), ['status'])
+        self.assertEqual(complete(table, ['-c', 'foo', 'database'], ''), ['--force',
+            '--help', '--version', 'dump', 'migrate'])
+        self.assertEqual(complete(table, ['db', 'migrate'], '--f'), [])
+
+    def test_complete_prefix(self):
+        "complete should follow unique subcommand prefixes"
+        table = completion_table(self.make_parser())
+        self.assertEqual(complete(table, ['data', 'mi'], ''), ['--help', '--version'])
+        self.assertEqual(complete(table, ['d'], 'm'), ['migrate'])
+        self.assertEqual(complete(table, ['db', 'du'], '-'), ['--help', '--version'])
+        self.assertTrue("            dat) path=db ;;\n" in generate_bash(self.make_parser()))
+
+    def test_completion_index(self):
+        "complete should load the completion table from an index file"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'completion.index')
+            write_completion_index(self.make_parser(), path)
+            self.assertEqual(complete(path, ['db'], 'm'), ['migrate'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_completion_script(self):
+        "write_completion_script should write a standalone completion script"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'complete.py')
+            write_completion_script(self.make_parser(), path)
+            with open(path) as f:
+                self.assertFalse('pesky' in f.read().split('\n', 2)[2])
+            output = subprocess.Popen([sys.executable, path, 'db', ''],
+                stdout=subprocess.PIPE).communicate()[0]
+            self.assertEqual(output.split(), ['--force', '--help', '--version', 'dump', 'migrate'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_generate_scripts(self):
+        "generate_bash and generate_zsh should generate completion scripts"
+        parser = self.make_parser()
+        script = generate_bash(parser)
+        self.assertTrue("complete -F _fooprogram fooprogram\n" in script)
+        self.assertTrue(generate_zsh(parser).startswith("#compdef fooprogram\n"))
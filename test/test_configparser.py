@@ -1,5 +1,5 @@
 
-import os, sys, unittest
+import os, sys, shutil, tempfile, marshal, unittest
 from pesky.settings.configparser import ConfigParser
 from pesky.settings import ConfigureError
 
@@ -20,6 +20,39 @@ class TestConfigParser(unittest.TestCase):
         self.assertEqual(store.get('fooprogram.ini.foo.optional'), ['bar'])
         self.assertEqual(store.get('fooprogram.ini.foo.spaces in key'), ['baz'])
 
+    def test_config_section_mmap(self):
+        "ConfigParser should parse a section through a memory map"
+        parser = ConfigParser()
+        parser.set_path(self.ini_path)
+        parser.set_required(True)
+        parser.set_use_mmap(True)
+        parser.add_section('foo', 'fooprogram.ini.foo')
+        parser.add_option('foo', 'optional', 'fooprogram.ini.optional')
+        store = parser.render()
+        self.assertEqual(store.get('fooprogram.ini.foo.required'), ['foo'])
+        self.assertEqual(store.get('fooprogram.ini.foo.spaces in key'), ['baz'])
+        self.assertEqual(store.get('fooprogram.ini.optional'), ['bar'])
+
+    def test_config_section_selective(self):
+        "ConfigParser should skip unregistered sections in selective mode"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            with open(path, 'w') as f:
+                f.write("[DEFAULT]\nshared = 0\n[skipped]\nnot an option\n[foo]\nvalue = 1\n[bar]\nvalue = 2\n")
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_required(True)
+            parser.set_selective(True)
+            parser.add_section('foo', 'fooprogram.ini.foo')
+            parser.add_option('bar', 'value', 'fooprogram.ini.bar')
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.value'), ['1'])
+            self.assertEqual(store.get('fooprogram.ini.foo.shared'), ['0'])
+            self.assertEqual(store.get('fooprogram.ini.bar'), ['2'])
+        finally:
+            shutil.rmtree(tmpdir)
+
     def test_optional_config_section(self):
         "ConfigParser should parse a missing optional section"
         parser = ConfigParser()
@@ -62,3 +95,176 @@ class TestConfigParser(unittest.TestCase):
         parser.set_required(True)
         parser.add_option('foo', 'missing', 'fooprogram.ini.foo.missing', required=True)
         self.assertRaises(ConfigureError, parser.render)
+
+    def test_compiled_cache(self):
+        "ConfigParser should load the rendered configuration from the compiled cache"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            cache_path = os.path.join(tmpdir, 'config.cache')
+            parser = ConfigParser()
+            parser.set_path(self.ini_path)
+            parser.set_required(True)
+            parser.set_cache_path(cache_path)
+            parser.add_section('foo', 'fooprogram.ini.foo')
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.required'), ['foo'])
+            self.assertTrue(os.path.exists(cache_path))
+            # tamper with the cached values to prove they are used
+            with open(cache_path, 'rb') as f:
+                key,values = marshal.load(f)
+            values['fooprogram.ini.foo.required'] = ['cached']
+            with open(cache_path, 'wb') as f:
+                marshal.dump((key, values), f)
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.required'), ['cached'])
+            # changing the registered sections invalidates the cache
+            parser.add_section('foo', 'barprogram.ini.foo')
+            store = parser.render()
+            self.assertEqual(store.get('barprogram.ini.foo.required'), ['foo'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_lazy_section(self):
+        "ConfigParser should not read the configuration until a lazy section is accessed"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_required(True)
+            section = parser.get_section('foo')
+            with open(path, 'w') as f:
+                f.write("[foo]\nvalue = 1\n[bar]\nnot an option\n")
+            self.assertEqual(section.get_int('value'), 1)
+            self.assertEqual(parser.get_section('missing').get_str('value', 'default'), 'default')
+            os.unlink(path)
+            self.assertEqual(section.get_str('value'), '1')
+            self.assertRaises(ConfigureError, parser.get_section('foo').get_str, 'value')
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_config_directory(self):
+        "ConfigParser should merge configuration fragments in order"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            directory = os.path.join(tmpdir, 'config.d')
+            os.mkdir(directory)
+            with open(path, 'w') as f:
+                f.write("[foo]\nvalue = 0\nbase = 1\n")
+            for i in range(20):
+                with open(os.path.join(directory, '%02i.conf' % i), 'w') as f:
+                    f.write("[foo]\nvalue = %i\nvalue%i = %i\n" % (i, i, i))
+            with open(os.path.join(directory, 'ignored.txt'), 'w') as f:
+                f.write("[foo]\nvalue = ignored\n")
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_directory(directory, threads=4)
+            parser.add_section('foo', 'fooprogram.ini.foo')
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.value'), ['19'])
+            self.assertEqual(store.get('fooprogram.ini.foo.base'), ['1'])
+            self.assertEqual(store.get('fooprogram.ini.foo.value7'), ['7'])
+            os.unlink(path)
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.base'), None)
+            self.assertEqual(store.get('fooprogram.ini.foo.value'), ['19'])
+            parser.set_required(True)
+            self.assertRaises(ConfigureError, parser.render)
+            parser.set_path(None)
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.value'), ['19'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_render_async(self):
+        "ConfigParser should render on a background thread"
+        parser = ConfigParser()
+        parser.set_path(self.ini_path)
+        parser.set_required(True)
+        parser.add_section('foo', 'fooprogram.ini.foo')
+        store = parser.render_async().get(5)
+        self.assertEqual(store.get('fooprogram.ini.foo.required'), ['foo'])
+        parser.set_path(os.path.join(tests_directory, 'missing.ini'))
+        self.assertRaises(ConfigureError, parser.render_async().get, 5)
+
+    def test_interpolation(self):
+        "ConfigParser should expand references when interpolation is enabled"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            with open(path, 'w') as f:
+                f.write("[paths]\nbase = ${HOME}/app\n[foo]\ndata = ${paths:base}/data\n")
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_cache_path(os.path.join(tmpdir, 'config.cache'))
+            parser.set_interpolation(True, {'HOME': '/home/foo'})
+            parser.add_section('foo', 'fooprogram.ini.foo')
+            parser.add_option('paths', 'base', 'fooprogram.ini.base')
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.data'), ['/home/foo/app/data'])
+            self.assertEqual(store.get('fooprogram.ini.base'), ['/home/foo/app'])
+            parser.set_interpolation(False)
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.data'), ['${paths:base}/data'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_interpolation_mmap(self):
+        "ConfigParser should not read unregistered sections when interpolating"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            with open(path, 'w') as f:
+                f.write("[foo]\ndata = ${paths:base}/data\n[paths]\nbase = /app\n[other]\nnot an option\n")
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_use_mmap(True)
+            parser.set_interpolation(True, {})
+            parser.add_section('foo', 'fooprogram.ini.foo')
+            store = parser.render()
+            self.assertEqual(store.get('fooprogram.ini.foo.data'), ['/app/data'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_lazy_section_read_path(self):
+        "ConfigParser lazy sections should return the same values as render"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            directory = os.path.join(tmpdir, 'config.d')
+            os.mkdir(directory)
+            with open(path, 'w') as f:
+                f.write("[foo]\nvalue = 1\nbase = ${paths:base}\n[paths]\nbase = /app\n")
+            with open(os.path.join(directory, '00.conf'), 'w') as f:
+                f.write("[foo]\nvalue = 2\n")
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_directory(directory)
+            parser.set_interpolation(True, {})
+            parser.add_section('foo', 'fooprogram.ini.foo')
+            store = parser.render()
+            section = parser.get_section('foo')
+            self.assertEqual(store.get('fooprogram.ini.foo.value'), ['2'])
+            self.assertEqual(section.get_str('value'), '2')
+            self.assertEqual(store.get('fooprogram.ini.foo.base'), ['/app'])
+            self.assertEqual(section.get_str('base'), '/app')
+            parser.set_directory(None)
+            parser.set_use_mmap(True)
+            self.assertEqual(parser.get_section('foo').get_str('value'), '1')
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_lazy_section_interpolation(self):
+        "ConfigParser lazy sections should only parse the referenced sections when interpolating"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            with open(path, 'w') as f:
+                f.write("[a]\nbase = ${b:base}\n[b]\nbase = /app\n[c]\ngarbage line\n")
+            parser = ConfigParser()
+            parser.set_path(path)
+            parser.set_interpolation(True, {})
+            self.assertEqual(parser.get_section('a').get_str('base'), '/app')
+        finally:
+            shutil.rmtree(tmpdir)
@@ -27,3 +27,35 @@ class TestEnvironmentParser(unittest.TestCase):
         os.environ = {}
         parser.add_env_var('MISSING', 'fooprogram.env.missing', required=True)
         self.assertRaises(ConfigureError, parser.render)
+
+    def test_cached_render(self):
+        "EnvironmentParser should return the previous store if the environment is unchanged"
+        parser = EnvironmentParser()
+        parser.add_env_var('HOME', 'fooprogram.env.home')
+        store = parser.render({'HOME': '/tmp', 'OTHER': 'foo'})
+        self.assertTrue(parser.render({'HOME': '/tmp'}) is store)
+        changed = parser.render({'HOME': '/home'})
+        self.assertEqual(changed.get('fooprogram.env.home'), ['/home'])
+        parser.add_env_var('SHELL', 'fooprogram.env.shell')
+        self.assertEqual(parser.render({'HOME': '/home', 'SHELL': 'sh'}).get('fooprogram.env.shell'), ['sh'])
+
+    def test_generation(self):
+        "EnvironmentParser should not read the environment if the generation is unchanged"
+        parser = EnvironmentParser()
+        parser.add_env_var('HOME', 'fooprogram.env.home')
+        store = parser.render({'HOME': '/tmp'}, generation=1)
+        self.assertTrue(parser.render({'HOME': '/home'}, generation=1) is store)
+        self.assertEqual(parser.render({'HOME': '/home'}, generation=2).get('fooprogram.env.home'), ['/home'])
+
+    def test_env_prefix(self):
+        "EnvironmentParser should map environment variables matching a prefix"
+        parser = EnvironmentParser()
+        parser.add_env_prefix('MYAPP_', 'myapp')
+        parser.add_env_prefix('MYAPP_DB__', 'database', separator='__', lowercase=False)
+        environ = {'MYAPP_DB_HOST': 'localhost', 'MYAPP_PORT': '80', 'MYAPP_': 'ignored',
+            'MYAPP_DB__User_Name': 'root', 'OTHER_HOST': 'ignored'}
+        store = parser.render(environ)
+        self.assertEqual(sorted(store.iteritems()), [('database.User_Name', ['root']),
+            ('myapp.db.host', ['localhost']), ('myapp.port', ['80'])])
+        environ['MYAPP_PORT'] = '8080'
+        self.assertEqual(parser.render(environ).get('myapp.port'), ['8080'])
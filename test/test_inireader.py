@@ -0,0 +1,70 @@
+
+import os, shutil, tempfile, unittest
+from ConfigParser import RawConfigParser
+from pesky.settings.inireader import IniReader
+from pesky.settings import ConfigureError
+
+contents = """# comment
+[DEFAULT]
+shared = default value
+
+[foo]
+Required = foo
+optional: bar ; comment
+spaces in key = baz
+multi = line one
+  line two
+empty = ""
+rem this line is ignored
+;comment
+
+[bar]
+value = 1
+
+[foo]
+later = 2
+"""
+
+class TestIniReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'config.ini')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, contents):
+        with open(self.path, 'w') as f:
+            f.write(contents)
+
+    def test_compatibility(self):
+        "IniReader should parse sections like RawConfigParser"
+        self.write(contents)
+        config = RawConfigParser()
+        config.read(self.path)
+        with IniReader(self.path) as reader:
+            self.assertEqual(sorted(reader.sections()), sorted(config.sections()))
+            for section in config.sections():
+                self.assertEqual(sorted(reader.items(section)), sorted(config.items(section)))
+            self.assertTrue(reader.has_option('foo', 'shared'))
+            self.assertFalse(reader.has_option('missing', 'shared'))
+            self.assertEqual(reader.get('foo', 'REQUIRED'), 'foo')
+
+    def test_lazy_parsing(self):
+        "IniReader should only parse sections which are accessed"
+        self.write("[foo]\nvalue = 1\n[bar]\nnot an option\n")
+        with IniReader(self.path) as reader:
+            self.assertEqual(reader.get('foo', 'value'), '1')
+            self.assertRaises(ConfigureError, reader.items, 'bar')
+
+    def test_empty_file(self):
+        "IniReader should read an empty file"
+        self.write("")
+        with IniReader(self.path) as reader:
+            self.assertEqual(reader.sections(), [])
+
+    def test_missing_section_header(self):
+        "IniReader should raise ConfigureError if there is no section header"
+        self.write("value = 1\n[foo]\n")
+        self.assertRaises(ConfigureError, IniReader, self.path)
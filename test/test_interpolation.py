@@ -0,0 +1,74 @@
+
+import os, shutil, tempfile, unittest
+from ConfigParser import RawConfigParser
+from pesky.settings.interpolation import Interpolator
+from pesky.settings.inireader import IniReader
+from pesky.settings import ConfigureError
+
+class TestInterpolator(unittest.TestCase):
+
+    def make_config(self, **sections):
+        config = RawConfigParser()
+        for section,items in sections.items():
+            config.add_section(section)
+            for name,value in items.items():
+                config.set(section, name, value)
+        return config
+
+    def test_interpolate(self):
+        "Interpolator should expand references, environment variables and $$"
+        interpolator = Interpolator({'HOME': '/home/foo'})
+        interpolator.load(self.make_config(
+            paths={'base': '${HOME}/app', 'data': '${paths:base}/data'},
+            db={'file': '${paths:Data}/db', 'price': '$$5'}))
+        self.assertEqual(interpolator.get('db', 'file'), '/home/foo/app/data/db')
+        self.assertEqual(interpolator.get('paths', 'base'), '/home/foo/app')
+        self.assertEqual(interpolator.get('db', 'price'), '$5')
+
+    def test_interpolate_errors(self):
+        "Interpolator should raise ConfigureError for cycles and undefined references"
+        interpolator = Interpolator({})
+        interpolator.load(self.make_config(foo={
+            'a': '${foo:b}', 'b': '${foo:c}', 'c': '${foo:a}',
+            'self': 'x${foo:self}', 'undefined': '${foo:missing}',
+            'env': '${MISSING}', 'ok': 'fine'}))
+        self.assertRaises(ConfigureError, interpolator.get, 'foo', 'a')
+        self.assertRaises(ConfigureError, interpolator.get, 'foo', 'self')
+        self.assertRaises(ConfigureError, interpolator.get, 'foo', 'undefined')
+        self.assertRaises(ConfigureError, interpolator.get, 'foo', 'env')
+        self.assertEqual(interpolator.get('foo', 'ok'), 'fine')
+        self.assertRaises(ConfigureError, interpolator.load, self.make_config(foo={'bad': '${foo'}))
+        self.assertEqual(interpolator.get('foo', 'ok'), 'fine')
+
+    def test_reload(self):
+        "Interpolator should only resolve the dependents of a changed value again"
+        environ = {'ROOT': '/a'}
+        interpolator = Interpolator(environ)
+        config = self.make_config(foo={'root': '${ROOT}', 'x': '${foo:root}/x', 'y': '${foo:x}/y'},
+            bar={'z': 'z', 'w': '${bar:z}'})
+        self.assertEqual(len(interpolator.load(config)), 5)
+        self.assertEqual(interpolator.get('foo', 'y'), '/a/x/y')
+        self.assertEqual(interpolator.get('bar', 'w'), 'z')
+        self.assertEqual(interpolator.load(config), set())
+        config.set('foo', 'x', '${foo:root}/xx')
+        self.assertEqual(interpolator.load(config), set([('foo', 'x'), ('foo', 'y')]))
+        self.assertEqual(interpolator.get('foo', 'y'), '/a/xx/y')
+        environ['ROOT'] = '/b'
+        self.assertEqual(interpolator.load(config), set([('foo', 'root'), ('foo', 'x'), ('foo', 'y')]))
+        self.assertEqual(interpolator.get('foo', 'y'), '/b/xx/y')
+        self.assertEqual(interpolator.get('bar', 'w'), 'z')
+
+    def test_load_sections(self):
+        "Interpolator should only read the specified sections and the sections they reference"
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'config.ini')
+            with open(path, 'w') as f:
+                f.write("[foo]\na = ${bar:b}\n[bar]\nb = ${baz:c}\n[baz]\nc = 1\n[other]\nnot an option\n")
+            with IniReader(path) as reader:
+                interpolator = Interpolator({})
+                self.assertEqual(len(interpolator.load(reader, ['foo'])), 3)
+                self.assertEqual(interpolator.get('foo', 'a'), '1')
+                self.assertEqual(sorted(reader._parsed.keys()), ['DEFAULT', 'bar', 'baz', 'foo'])
+        finally:
+            shutil.rmtree(tmpdir)
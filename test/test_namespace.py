@@ -0,0 +1,123 @@
+
+import threading, unittest
+from pesky.settings.namespace import Namespace, FrozenNamespace, SharedNamespace
+from pesky.settings.store import Store
+
+class TestNamespace(unittest.TestCase):
+
+    def make_store(self, *items):
+        store = Store()
+        for name,value in items:
+            store.append(name, value)
+        return store
+
+    def test_merge(self):
+        "Namespace should merge a store"
+        ns = Namespace()
+        ns.merge(self.make_store(('foo.bar', '1'), ('foo.bar', '2')))
+        ns.merge(self.make_store(('foo.bar', '3'), ('foo.baz', '4')))
+        self.assertEqual(ns.get('foo.bar'), ['1', '2', '3'])
+        self.assertEqual(ns.get('foo.baz'), ['4'])
+        self.assertEqual(ns.get('foo.qux'), None)
+
+    def test_freeze(self):
+        "Namespace.freeze should return an immutable snapshot"
+        ns = Namespace()
+        ns.merge(self.make_store(('foo.bar', '1'), ('foo.bar', '2')))
+        frozen = ns.freeze()
+        ns.merge(self.make_store(('foo.bar', '3'), ('foo.baz', '4')))
+        self.assertTrue(isinstance(frozen, FrozenNamespace))
+        self.assertEqual(frozen.get('foo.bar'), ('1', '2'))
+        self.assertFalse(frozen.contains('foo.baz'))
+        self.assertEqual(len(frozen), 1)
+        self.assertRaises(AttributeError, setattr, frozen, '_values', {})
+
+    def test_iter_prefix(self):
+        "Namespace.iter_prefix should iterate names under a prefix"
+        ns = Namespace()
+        ns.merge(self.make_store(('myapp.db', '0'), ('myapp.db.host', '1'),
+            ('myapp.db.port', '2'), ('myapp.dbname', '3'), ('other', '4')))
+        self.assertEqual(sorted(ns.iter_prefix('myapp.db')), [
+            ('myapp.db', ['0']), ('myapp.db.host', ['1']), ('myapp.db.port', ['2'])])
+        self.assertEqual(sorted(ns.iter_prefix('myapp.db.')), sorted(ns.iter_prefix('myapp.db')))
+        self.assertEqual(list(ns.iter_prefix('missing')), [])
+        self.assertEqual(len(list(ns.iter_prefix(''))), 5)
+
+    def test_subtree(self):
+        "Namespace.subtree should return a live view of names under a prefix"
+        ns = Namespace()
+        ns.merge(self.make_store(('myapp.db.host', '1'), ('myapp.dbname', '3')))
+        view = ns.subtree('myapp.db')
+        self.assertEqual(view.get('host'), ['1'])
+        self.assertFalse(view.contains('port'))
+        ns.merge(self.make_store(('myapp.db.port', '2')))
+        self.assertTrue(view.contains('port'))
+        self.assertEqual(sorted(view.iteritems()), [('host', ['1']), ('port', ['2'])])
+        self.assertEqual(ns.subtree('myapp').subtree('db').get('port'), ['2'])
+
+    def test_replace(self):
+        "Namespace.replace should apply only the differences between two stores"
+        ns = Namespace()
+        options = self.make_store(('foo.bar', 'option'))
+        config = self.make_store(('foo.bar', '1'), ('foo.baz', '2'), ('foo.qux', '3'))
+        ns.merge(options)
+        ns.merge(config)
+        reloaded = self.make_store(('foo.bar', '11'), ('foo.baz', '2'), ('foo.new', '4'))
+        added,removed,changed = ns.replace(config, reloaded)
+        self.assertEqual(added, set(['foo.new']))
+        self.assertEqual(removed, set(['foo.qux']))
+        self.assertEqual(changed, set(['foo.bar']))
+        self.assertEqual(ns.get('foo.bar'), ['option', '11'])
+        self.assertEqual(ns.get('foo.qux'), None)
+        self.assertEqual(sorted(ns.iter_prefix('foo')), [('foo.bar', ['option', '11']),
+            ('foo.baz', ['2']), ('foo.new', ['4'])])
+        self.assertRaises(ValueError, ns.replace, config, reloaded)
+
+    def test_replace_delta(self):
+        "Namespace.replace should only touch the names in a precomputed delta"
+        ns = Namespace()
+        config = self.make_store(('foo.bar', '1'), ('foo.baz', '2'))
+        ns.merge(config)
+        reloaded = self.make_store(('foo.bar', '11'), ('foo.baz', '2'))
+        delta = (set(), set(), set(['foo.bar']))
+        self.assertEqual(ns.replace(config, reloaded, delta), delta)
+        self.assertEqual(ns.get('foo.bar'), ['11'])
+        self.assertEqual(ns.get('foo.baz'), ['2'])
+
+    def test_shared_publish(self):
+        "SharedNamespace should publish new versions without disturbing snapshots"
+        ns = Namespace()
+        ns.merge(self.make_store(('foo.bar', '1')))
+        shared = SharedNamespace(ns)
+        snapshot = shared.snapshot()
+        ns.merge(self.make_store(('foo.bar', '2')))
+        self.assertEqual(shared.get('foo.bar'), ('1',))
+        shared.publish(ns)
+        self.assertEqual(shared.get('foo.bar'), ('1', '2'))
+        self.assertEqual(snapshot.get('foo.bar'), ('1',))
+        self.assertEqual(shared.generation, 2)
+        shared.publish(None)
+        self.assertFalse(shared.contains('foo.bar'))
+
+    def test_shared_concurrent(self):
+        "SharedNamespace readers should always see a consistent version"
+        def make_version(i):
+            ns = Namespace()
+            ns.merge(self.make_store(('foo.a', str(i)), ('foo.b', str(i))))
+            return ns.freeze()
+        shared = SharedNamespace(make_version(0))
+        errors = []
+        def reader():
+            for i in range(2000):
+                snapshot = shared.snapshot()
+                if snapshot.get('foo.a') != snapshot.get('foo.b'):
+                    errors.append(snapshot)
+        threads = [threading.Thread(target=reader) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for i in range(1, 200):
+            shared.publish(make_version(i))
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(shared.get('foo.a'), ('199',))
@@ -1,6 +1,7 @@
 
-import sys, unittest
+import sys, getopt, unittest
 from pesky.settings.optionparser import OptionParser, ProgramUsage, ProgramVersion
+from pesky.settings import ConfigureError
 
 class TestOptionParser(unittest.TestCase):
 
@@ -143,3 +144,161 @@ class TestOptionParser(unittest.TestCase):
         parser.set_description("fooprogram is great!")
         sys.argv = ['program', '--version']
         self.assertRaises(ProgramVersion, parser.render)
+
+    def test_render_many(self):
+        "OptionParser should parse many command lines"
+        parser = OptionParser()
+        parser.set_appname("fooprogram")
+        parser.add_option('s', 'long', 'fooprogram.option.s')
+        parser.add_switch('f', 'flag', 'fooprogram.switch.f', reverse=True)
+        stores = parser.render_many([['program', '-s', 'foo'], ['program', '--long=bar', '-f']])
+        self.assertEqual(len(stores), 2)
+        self.assertEqual(stores[0].get('fooprogram.option.s'), ['foo'])
+        self.assertEqual(stores[1].get('fooprogram.option.s'), ['bar'])
+        self.assertEqual(stores[1].get('fooprogram.switch.f'), ['false'])
+
+    def test_render_many_errors(self):
+        "OptionParser.render_many should report every invalid command line at once"
+        parser = OptionParser()
+        parser.set_appname("fooprogram")
+        parser.add_option('s', 'long', 'fooprogram.option.s', recurring=False)
+        try:
+            parser.render_many([['program', '-s', 'foo'], ['program', '-x'],
+                ['program', '-s', 'a', '-s', 'b'], ['program', '--help']])
+        except ConfigureError, e:
+            message = str(e)
+        else:
+            self.fail("ConfigureError was not raised")
+        self.assertFalse('command line 0' in message)
+        self.assertTrue('command line 1: option -x not recognized' in message)
+        self.assertTrue('command line 2: ' in message)
+        self.assertTrue('command line 3: help requested' in message)
+
+    def test_duplicate_option(self):
+        "OptionParser should raise ConfigureError if a non-recurring option is repeated"
+        parser = OptionParser()
+        parser.add_shortoption('s', 'fooprogram.shortoption.s')
+        sys.argv = ['program', '-s', 'foo', '-s', 'bar']
+        self.assertRaises(ConfigureError, parser.render)
+
+    def test_long_option_value(self):
+        "OptionParser should parse a long option with an attached value"
+        parser = OptionParser()
+        parser.add_longoption('long', 'fooprogram.longoption.long')
+        sys.argv = ['program', '--long=foo']
+        store = parser.render()
+        self.assertEqual(store.get('fooprogram.longoption.long'), ['foo'])
+
+    def test_long_option_prefix(self):
+        "OptionParser should parse a unique prefix of a long option"
+        parser = OptionParser()
+        parser.add_longoption('alpha', 'fooprogram.longoption.alpha')
+        parser.add_longoption('alpine', 'fooprogram.longoption.alpine')
+        sys.argv = ['program', '--alph', 'foo', '--alpi=bar']
+        store = parser.render()
+        self.assertEqual(store.get('fooprogram.longoption.alpha'), ['foo'])
+        self.assertEqual(store.get('fooprogram.longoption.alpine'), ['bar'])
+        sys.argv = ['program', '--alp', 'foo']
+        self.assertRaises(getopt.GetoptError, parser.render)
+
+    def test_bundled_short_options(self):
+        "OptionParser should parse bundled short switches and options"
+        parser = OptionParser()
+        parser.add_shortswitch('a', 'fooprogram.shortswitch.a')
+        parser.add_shortswitch('b', 'fooprogram.shortswitch.b')
+        parser.add_shortoption('s', 'fooprogram.shortoption.s')
+        sys.argv = ['program', '-absfoo']
+        store = parser.render()
+        self.assertEqual(store.get('fooprogram.shortswitch.a'), ['true'])
+        self.assertEqual(store.get('fooprogram.shortswitch.b'), ['true'])
+        self.assertEqual(store.get('fooprogram.shortoption.s'), ['foo'])
+
+    def test_invalid_options(self):
+        "OptionParser should raise GetoptError for invalid options"
+        parser = OptionParser()
+        parser.add_shortoption('s', 'fooprogram.shortoption.s')
+        parser.add_longswitch('long', 'fooprogram.longswitch.long')
+        for argv in (['-x'], ['--missing'], ['-s'], ['--long=foo'], ['--help', '-x']):
+            sys.argv = ['program'] + argv
+            self.assertRaises(getopt.GetoptError, parser.render)
+
+    def test_nested_sub_command(self):
+        "OptionParser should parse nested subcommands"
+        parser = OptionParser()
+        parser.add_shortoption('s', 'fooprogram.option.s')
+        subparser = parser.add_subcommand("db")
+        subsubparser = subparser.add_subcommand("migrate")
+        subsubparser.add_longswitch('force', 'fooprogram.db.migrate.force')
+        sys.argv = ['program', '-s', 'foo', 'db', '--', 'migrate', 'arg', '--force']
+        store = parser.render()
+        self.assertEqual(store.get('pesky.option.command'), ['db', 'migrate'])
+        self.assertEqual(store.get('fooprogram.db.migrate.force'), ['true'])
+        sys.argv = ['program', 'db']
+        self.assertRaises(ConfigureError, parser.render)
+
+    def test_sub_command_alias_and_prefix(self):
+        "OptionParser should resolve subcommand aliases and unique prefixes"
+        parser = OptionParser()
+        parser.add_subcommand("status", aliases=['st'])
+        parser.add_subcommand("start")
+        parser.add_subcommand("remove", aliases=['rm'])
+        for command,expected in (('st', 'status'), ('stat', 'status'), ('star', 'start'), ('rm', 'remove'), ('rem', 'remove')):
+            sys.argv = ['program', command]
+            store = parser.render()
+            self.assertEqual(store.get('pesky.option.command'), [expected])
+        for command in ('sta', 'missing'):
+            sys.argv = ['program', command]
+            self.assertRaises(ConfigureError, parser.render)
+        self.assertRaises(ConfigureError, parser.add_subcommand, 'rm')
+
+    def test_sub_command_alias_prefix(self):
+        "OptionParser should not treat a prefix of a subcommand and its alias as ambiguous"
+        parser = OptionParser()
+        parser.add_subcommand("list", aliases=['ls'])
+        sys.argv = ['program', 'l']
+        self.assertEqual(parser.render().get('pesky.option.command'), ['list'])
+        parser.add_subcommand("load")
+        self.assertRaises(ConfigureError, parser.render)
+        sys.argv = ['program', 'li']
+        self.assertEqual(parser.render().get('pesky.option.command'), ['list'])
+
+    def test_usage_text(self):
+        "ProgramUsage should display the cached help text of the parser"
+        parser = OptionParser()
+        parser.set_appname("fooprogram")
+        parser.set_usage("[OPTIONS] COMMAND")
+        parser.set_description("fooprogram is great!")
+        parser.add_option('s', 'long', 'fooprogram.option.s', help="an option", metavar="FOO")
+        parser.add_shortswitch('q', 'fooprogram.switch.q', help="a switch")
+        subparser = parser.add_subcommand("dosub")
+        helptext = parser.get_help()
+        self.assertEqual(helptext, "Usage: fooprogram [OPTIONS] COMMAND\n\n"
+            "fooprogram is great!\n\n"
+            " -s,--long FOO    an option\n"
+            " -q               a switch\n\n"
+            "Available subcommands:\n\n"
+            " dosub\n\n")
+        self.assertTrue(parser.get_help() is helptext)
+        sys.argv = ['program', '--help']
+        try:
+            parser.render()
+        except ProgramUsage, e:
+            self.assertEqual(str(e), helptext)
+        subparser.set_usage("ARGS")
+        self.assertEqual(subparser.get_help(), "Usage: fooprogram dosub ARGS\n\n")
+        parser.add_subcommand("another")
+        self.assertTrue(" another\n" in parser.get_help())
+
+    def test_help_tree(self):
+        "OptionParser should render help for every subcommand"
+        parser = OptionParser()
+        parser.set_appname("fooprogram")
+        db = parser.add_subcommand("db")
+        db.add_subcommand("migrate")
+        parser.add_subcommand("status")
+        helptexts = parser.render_help_tree()
+        self.assertEqual([commands for commands,helptext in helptexts],
+            ['fooprogram', 'fooprogram db', 'fooprogram db migrate', 'fooprogram status'])
+        self.assertEqual(helptexts[2][1], db._subcommands['migrate'].get_help())
+        parser.set_appname("barprogram")
+        self.assertTrue(db.get_help().startswith("Usage: barprogram db"))
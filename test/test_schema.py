@@ -0,0 +1,68 @@
+
+import datetime, unittest
+from pesky.settings.schema import Schema, TypedSettings
+from pesky.settings.namespace import Namespace
+from pesky.settings.store import Store
+from pesky.settings import ConfigureError
+
+class TestSchema(unittest.TestCase):
+
+    def make_namespace(self, *stores):
+        ns = Namespace()
+        for items in stores:
+            store = Store()
+            for name,value in items:
+                store.append(name, value)
+            ns.merge(store)
+        return ns
+
+    def test_validate(self):
+        "Schema should coerce each field"
+        schema = Schema()
+        schema.add_field('foo.port', 'int', minimum=1, maximum=65535)
+        schema.add_field('foo.interval', 'timedelta')
+        schema.add_field('foo.debug', 'bool', default=False)
+        schema.add_field('foo.ratio', 'percent')
+        schema.add_field('foo.peers', recurring=True)
+        ns = self.make_namespace(
+            [('foo.port', '8080'), ('foo.peers', 'a')],
+            [('foo.port', '80'), ('foo.interval', '5s'), ('foo.ratio', '50%'), ('foo.peers', 'b')])
+        typed = schema.validate(ns)
+        self.assertTrue(isinstance(typed, TypedSettings))
+        self.assertEqual(typed.get('foo.port'), 8080)
+        self.assertEqual(typed.get('foo.interval'), datetime.timedelta(seconds=5))
+        self.assertEqual(typed.get('foo.debug'), False)
+        self.assertEqual(typed.get('foo.ratio'), 0.5)
+        self.assertEqual(typed.get('foo.peers'), ['a', 'b'])
+        self.assertRaises(KeyError, typed.get, 'foo.missing')
+        self.assertRaises(AttributeError, setattr, typed, '_values', {})
+
+    def test_validate_errors(self):
+        "Schema should report every invalid field at once"
+        schema = Schema()
+        schema.add_field('foo.port', 'int', maximum=65535)
+        schema.add_field('foo.size', 'size')
+        schema.add_field('foo.host', required=True)
+        schema.add_field('foo.ok', 'int')
+        ns = self.make_namespace([('foo.port', '70000'), ('foo.size', 'big'), ('foo.ok', '1')])
+        try:
+            schema.validate(ns)
+        except ConfigureError, e:
+            message = str(e)
+        else:
+            self.fail("ConfigureError was not raised")
+        self.assertTrue('foo.port must be at most 65535' in message)
+        self.assertTrue('failed to parse foo.size' in message)
+        self.assertTrue('foo.host is required' in message)
+        self.assertFalse('foo.ok' in message)
+
+    def test_add_field(self):
+        "Schema.add_field should reject duplicate fields and unknown types"
+        schema = Schema()
+        schema.add_field('foo.bar', 'int')
+        self.assertRaises(ConfigureError, schema.add_field, 'foo.bar', 'str')
+        self.assertRaises(ConfigureError, schema.add_field, 'foo.baz', 'complex')
+        plan = schema.compile()
+        self.assertTrue(schema.compile() is plan)
+        schema.add_field('foo.baz', lambda s: s.upper())
+        self.assertEqual(schema.validate(self.make_namespace([('foo.baz', 'x')])).get('foo.baz'), 'X')
@@ -0,0 +1,107 @@
+
+import os, array, datetime, unittest
+from ConfigParser import RawConfigParser
+from pesky.settings.section import Section
+from pesky.settings.args import ArgSpec
+from pesky.settings import ConfigureError
+
+class TestSection(unittest.TestCase):
+
+    def make_section(self, **items):
+        options = RawConfigParser()
+        options.add_section('foo')
+        for name,value in items.items():
+            options.set('foo', name, value)
+        return Section('foo', options, '/')
+
+    def test_get_int(self):
+        "Section should coerce a value into an int"
+        section = self.make_section(count='42')
+        self.assertEqual(section.get_int('count'), 42)
+        self.assertEqual(section.get_int('missing', 7), 7)
+
+    def test_cache_hits(self):
+        "Section should cache coerced values"
+        section = self.make_section(interval='5 seconds')
+        self.assertEqual(section.get_timedelta('interval'), datetime.timedelta(seconds=5))
+        self.assertEqual(section.get_timedelta('interval'), datetime.timedelta(seconds=5))
+        self.assertEqual(section.cache_misses, 1)
+        self.assertEqual(section.cache_hits, 1)
+
+    def test_cache_missing(self):
+        "Section should return the default for a cached missing value"
+        section = self.make_section()
+        self.assertEqual(section.get_int('missing', 1), 1)
+        self.assertEqual(section.get_int('missing', 2), 2)
+        self.assertEqual(section.cache_hits, 1)
+
+    def test_cache_coerce(self):
+        "Section should cache get_list values per coerce function"
+        section = self.make_section(ports='80 443')
+        self.assertEqual(section.get_list('ports'), ['80', '443'])
+        self.assertEqual(section.get_list('ports', coerce=int), [80, 443])
+        self.assertEqual(section.get_list('ports', None, int), [80, 443])
+        self.assertEqual(section.cache_misses, 2)
+        section.get_list('ports').append('8080')
+        self.assertEqual(section.get_list('ports'), ['80', '443'])
+
+    def test_cache_closure(self):
+        "Section should not cache values coerced by a lambda or closure"
+        section = self.make_section(ports='80 443')
+        for i in range(1000):
+            self.assertEqual(section.get_list('ports', coerce=lambda v: int(v) + i), [80 + i, 443 + i])
+        self.assertEqual(section._cache, {})
+        section.get_list('ports', coerce=int)
+        self.assertEqual(len(section._cache['ports']), 1)
+
+    def test_set_invalidates_cache(self):
+        "Section.set should invalidate cached values"
+        section = self.make_section(count='1')
+        self.assertEqual(section.get_int('count'), 1)
+        section.set('COUNT', '2')
+        self.assertEqual(section.get_int('count'), 2)
+
+    def test_remove_invalidates_cache(self):
+        "Section.remove should invalidate cached values"
+        section = self.make_section(count='1')
+        self.assertEqual(section.get_int('count'), 1)
+        section.remove('count')
+        self.assertEqual(section.get_int('count'), None)
+
+    def test_get_many(self):
+        "Section.get_many should coerce values into an array"
+        section = self.make_section(a='512 MB', b='1k', c='2 bytes', n='2')
+        column = section.get_many(['a', 'B', 'c'], 'size')
+        self.assertTrue(isinstance(column, array.array))
+        self.assertEqual(list(column), [512 * 1024 * 1024, 1024, 2])
+        self.assertEqual(list(section.get_many(['n', 'd'], 'int', default=0)), [2, 0])
+
+    def test_get_many_errors(self):
+        "Section.get_many should report every invalid value at once"
+        section = self.make_section(a='50%', b='lots', c='10%')
+        try:
+            section.get_many(['a', 'b', 'c', 'd'], 'percent')
+        except ConfigureError, e:
+            message = str(e)
+        else:
+            self.fail("ConfigureError was not raised")
+        self.assertTrue('b: invalid percentage lots' in message)
+        self.assertTrue('d is missing' in message)
+        self.assertFalse('a:' in message)
+        self.assertRaises(ConfigureError, section.get_many, ['a'], 'complex')
+
+    def test_get_column(self):
+        "Section.get_column should coerce the values with a common prefix"
+        section = self.make_section(shard_1='0.5', shard_0='1.5', other='x')
+        section.remove('other')
+        names,column = section.get_column('shard_', 'float')
+        self.assertEqual(names, ['shard_0', 'shard_1'])
+        self.assertEqual(list(column), [1.5, 0.5])
+
+    def test_get_args(self):
+        "Section.get_args should accept validators or an ArgSpec"
+        section = self.make_section(listen='localhost 8080')
+        self.assertEqual(section.get_args('listen', str, int), ('localhost', 8080))
+        self.assertEqual(section.get_args('listen', ArgSpec(str, int, maximum=2)), ('localhost', 8080))
+        self.assertEqual(section.get_args('missing', ArgSpec(str), default=()), ())
+        self.assertRaises(ConfigureError, section.get_args, 'listen', ArgSpec(str, maximum=1))
@@ -0,0 +1,81 @@
+
+import os, sys, shutil, tempfile, threading, unittest
+from pesky.settings.settings import Settings
+from pesky.settings.schema import Schema
+from pesky.settings import ConfigureError
+
+class TestSettings(unittest.TestCase):
+
+    def setUp(self):
+        self.argv = sys.argv
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'config.ini')
+        with open(self.path, 'w') as f:
+            f.write("[foo]\nvalue = 1\n")
+
+    def tearDown(self):
+        sys.argv = self.argv
+        shutil.rmtree(self.tmpdir)
+
+    def make_settings(self, *args):
+        sys.argv = ['fooprogram'] + list(args)
+        settings = Settings('fooprogram', 'foogroup', '1.0', 'description', 'usage')
+        settings.config.add_section('foo', 'fooprogram.foo')
+        return settings
+
+    def test_parse(self):
+        "Settings should load the config file named on the command line"
+        settings = self.make_settings('-c', self.path)
+        ns = settings.parse()
+        self.assertEqual(ns.get('pesky.config.file'), [self.path])
+        self.assertEqual(ns.get('fooprogram.foo.value'), ['1'])
+
+    def test_parse_async(self):
+        "Settings should parse on a background thread"
+        settings = self.make_settings('-c', self.path)
+        results = []
+        def callback(ns):
+            results.append((ns, threading.current_thread()))
+        ns = settings.parse_async(callback).get(5)
+        self.assertEqual(ns.get('fooprogram.foo.value'), ['1'])
+        self.assertEqual(results[0][0], ns)
+        self.assertNotEqual(results[0][1], threading.current_thread())
+
+    def test_parse_async_callback_error(self):
+        "Settings.parse_async should raise a callback error from get without breaking the pool"
+        settings = self.make_settings('-c', self.path)
+        def callback(ns):
+            raise ValueError("broken callback")
+        self.assertRaises(ValueError, settings.parse_async(callback).get, 5)
+        ns = settings.parse_async().get(5)
+        self.assertEqual(ns.get('fooprogram.foo.value'), ['1'])
+
+    def test_parse_async_error(self):
+        "Settings.parse_async should raise the parsing error from get"
+        settings = self.make_settings('-c', os.path.join(self.tmpdir, 'missing.ini'))
+        self.assertRaises(ConfigureError, settings.parse_async().get, 5)
+
+    def test_parse_schema(self):
+        "Settings should validate the parsed settings against the schema"
+        settings = self.make_settings('-c', self.path)
+        schema = Schema()
+        schema.add_field('fooprogram.foo.value', 'int', maximum=1)
+        settings.set_schema(schema)
+        ns = settings.parse()
+        self.assertEqual(ns.typed.get('fooprogram.foo.value'), 1)
+        schema.add_field('fooprogram.foo.missing', required=True)
+        self.assertRaises(ConfigureError, settings.parse)
+
+    def test_parse_explicit_config(self):
+        "Settings should not merge the fragments directory into an explicit config file"
+        directory = os.path.join(self.tmpdir, 'conf.d')
+        os.mkdir(directory)
+        with open(os.path.join(directory, '00.conf'), 'w') as f:
+            f.write("[foo]\nvalue = 2\n")
+        settings = self.make_settings()
+        settings.config.set_path(None)
+        settings.config.set_directory(directory)
+        self.assertEqual(settings.parse().get('fooprogram.foo.value'), ['2'])
+        settings = self.make_settings('-c', self.path)
+        settings.config.set_directory(directory)
+        self.assertEqual(settings.parse().get('fooprogram.foo.value'), ['1'])
@@ -0,0 +1,41 @@
+
+import threading, unittest
+from pesky.settings.store import Store
+
+class TestStore(unittest.TestCase):
+
+    def test_remove(self):
+        "Store.remove should remove a name and its index entry"
+        store = Store()
+        store.append('foo.bar.baz', '1')
+        store.append('foo.qux', '2')
+        store.remove('foo.bar.baz')
+        store.remove('missing')
+        self.assertFalse(store.contains('foo.bar.baz'))
+        self.assertEqual(list(store.iter_prefix('foo.bar')), [])
+        self.assertEqual(list(store.iter_prefix('foo')), [('foo.qux', ['2'])])
+
+    def test_diff(self):
+        "Store.diff should return the added, removed and changed names"
+        store = Store()
+        store.append('foo', '1')
+        store.append('bar', '2')
+        other = Store()
+        other.set('foo', ['11'])
+        other.set('baz', ['3'])
+        self.assertEqual(store.diff(other), (set(['baz']), set(['bar']), set(['foo'])))
+
+    def test_append_concurrent(self):
+        "Store.append should not lose values appended concurrently"
+        store = Store()
+        def writer():
+            for i in range(1000):
+                store.append('foo.%i' % i, 'x')
+        threads = [threading.Thread(target=writer) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(1000):
+            self.assertEqual(store.get('foo.%i' % i), ['x'] * 8)
+        self.assertEqual(len(list(store.iter_prefix('foo'))), 1000)
@@ -0,0 +1,69 @@
+
+import datetime, unittest
+from pesky.settings.units import parse_timedelta, parse_size, parse_durations, parse_sizes, parse_percent, parse_bool
+from pesky.settings import ConfigureError
+
+class TestUnits(unittest.TestCase):
+
+    def test_parse_timedelta(self):
+        "parse_timedelta should parse a timedelta"
+        self.assertEqual(parse_timedelta('30 seconds'), datetime.timedelta(seconds=30))
+        self.assertEqual(parse_timedelta(' 2 Weeks '), datetime.timedelta(weeks=2))
+
+    def test_parse_compact_timedelta(self):
+        "parse_timedelta should parse compact, fractional and compound timedeltas"
+        self.assertEqual(parse_timedelta('250ms'), datetime.timedelta(milliseconds=250))
+        self.assertEqual(parse_timedelta('1.5 hours'), datetime.timedelta(minutes=90))
+        self.assertEqual(parse_timedelta('1h30m'), datetime.timedelta(minutes=90))
+        self.assertEqual(parse_timedelta('1 day 2 hours'), datetime.timedelta(days=1, hours=2))
+
+    def test_parse_exact_timedelta(self):
+        "parse_timedelta should round fractional timedeltas exactly"
+        self.assertEqual(parse_timedelta('16.06 s'), datetime.timedelta(seconds=16, microseconds=60000))
+        self.assertEqual(parse_timedelta('0.0000005 s'), datetime.timedelta(microseconds=1))
+        self.assertEqual(parse_durations(['16.06 s']), [datetime.timedelta(seconds=16, microseconds=60000)])
+
+    def test_parse_negative_quantity(self):
+        "parse_timedelta and parse_size should accept a signed quantity"
+        self.assertEqual(parse_timedelta('-5 seconds'), datetime.timedelta(seconds=-5))
+        self.assertEqual(parse_timedelta('+5 seconds'), datetime.timedelta(seconds=5))
+        self.assertEqual(parse_timedelta('1h -30m'), datetime.timedelta(minutes=30))
+        self.assertEqual(parse_size('-5 KB'), -5 * 1024)
+
+    def test_parse_invalid_timedelta(self):
+        "parse_timedelta should raise ConfigureError if the timedelta is invalid"
+        self.assertRaises(ConfigureError, parse_timedelta, '30')
+        self.assertRaises(ConfigureError, parse_timedelta, '30 fortnights')
+        self.assertRaises(ConfigureError, parse_timedelta, '1h x')
+        self.assertRaises(ConfigureError, parse_timedelta, '')
+
+    def test_parse_size(self):
+        "parse_size should parse a size"
+        self.assertEqual(parse_size('512 MB'), 512 * 1024 * 1024)
+        self.assertEqual(parse_size('1.5GB'), 3 * 512 * 1024 * 1024)
+        self.assertEqual(parse_size('1g 512m'), 3 * 512 * 1024 * 1024)
+        self.assertEqual(parse_size('100 bytes'), 100)
+
+    def test_parse_invalid_size(self):
+        "parse_size should raise ConfigureError if the size is invalid"
+        self.assertRaises(ConfigureError, parse_size, '512')
+        self.assertRaises(ConfigureError, parse_size, '512 parsecs')
+
+    def test_parse_bulk(self):
+        "parse_durations and parse_sizes should parse a sequence of strings"
+        self.assertEqual(parse_durations(['1s', '2 minutes']),
+            [datetime.timedelta(seconds=1), datetime.timedelta(minutes=2)])
+        self.assertEqual(parse_sizes(['1k', '2 MB']), [1024, 2 * 1024 * 1024])
+        self.assertRaises(ConfigureError, parse_sizes, ['1k', 'bogus'])
+
+    def test_parse_percent(self):
+        "parse_percent should parse a percentage"
+        self.assertEqual(parse_percent('75%'), 0.75)
+        self.assertEqual(parse_percent(' 12.5 % '), 0.125)
+        self.assertRaises(ConfigureError, parse_percent, '75')
+
+    def test_parse_bool(self):
+        "parse_bool should parse a bool"
+        self.assertEqual(parse_bool('Yes'), True)
+        self.assertEqual(parse_bool('off'), False)
+        self.assertRaises(ConfigureError, parse_bool, 'maybe')
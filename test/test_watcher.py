@@ -0,0 +1,163 @@
+
+import os, time, shutil, tempfile, threading, unittest
+from pesky.settings.configparser import ConfigParser
+from pesky.settings.watcher import ConfigWatcher
+
+class TestConfigWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'config.ini')
+        self.write("[foo]\nkeep = 1\nchange = 2\nremove = 3\n")
+        self.parser = ConfigParser()
+        self.parser.set_path(self.path)
+        self.parser.add_section('foo', 'fooprogram.foo')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, contents):
+        with open(self.path, 'w') as f:
+            f.write(contents)
+
+    def replace(self, contents):
+        with open(self.path + '.tmp', 'w') as f:
+            f.write(contents)
+        os.rename(self.path + '.tmp', self.path)
+
+    def test_check(self):
+        "ConfigWatcher should notify subscribers of changed names"
+        notifications = []
+        watcher = ConfigWatcher(self.parser, use_inotify=False)
+        watcher.subscribe(lambda *args: notifications.append(args))
+        self.assertFalse(watcher.check())
+        self.assertFalse(watcher.check())
+        self.write("[foo]\nkeep = 1\nchange = 22\nadd = 4\n")
+        self.assertTrue(watcher.check())
+        self.assertEqual(len(notifications), 1)
+        store,added,removed,changed = notifications[0]
+        self.assertEqual(store.get('fooprogram.foo.change'), ['22'])
+        self.assertEqual(added, set(['fooprogram.foo.add']))
+        self.assertEqual(removed, set(['fooprogram.foo.remove']))
+        self.assertEqual(changed, set(['fooprogram.foo.change']))
+
+    def test_check_fragments(self):
+        "ConfigWatcher should detect changes to configuration fragments"
+        directory = os.path.join(self.tmpdir, 'conf.d')
+        os.mkdir(directory)
+        self.parser.set_directory(directory)
+        watcher = ConfigWatcher(self.parser, use_inotify=False)
+        self.assertFalse(watcher.check())
+        with open(os.path.join(directory, '00.conf'), 'w') as f:
+            f.write("[foo]\nchange = 22\n")
+        self.assertTrue(watcher.check())
+        self.assertEqual(watcher.store.get('fooprogram.foo.change'), ['22'])
+        os.unlink(os.path.join(directory, '00.conf'))
+        self.assertTrue(watcher.check())
+        self.assertEqual(watcher.store.get('fooprogram.foo.change'), ['2'])
+
+    def test_iter_changes(self):
+        "ConfigWatcher.iter_changes should yield each change"
+        watcher = ConfigWatcher(self.parser, use_inotify=False)
+        watcher.check()
+        changes = watcher.iter_changes(timeout=0.1)
+        self.write("[foo]\nkeep = 1\nchange = 22\n")
+        watcher.check()
+        store,added,removed,changed = changes.next()
+        self.assertEqual(store.get('fooprogram.foo.change'), ['22'])
+        self.assertEqual(changed, set(['fooprogram.foo.change']))
+        self.assertEqual(list(changes), [])
+        changes.close()
+        self.assertEqual(watcher._subscribers, [])
+        self.assertEqual(list(changes), [])
+
+    def test_poll_changes(self):
+        "ChangeIterator.poll should return the next change without blocking"
+        watcher = ConfigWatcher(self.parser, use_inotify=False)
+        watcher.check()
+        changes = watcher.iter_changes()
+        self.assertEqual(changes.poll(), None)
+        self.write("[foo]\nkeep = 1\nchange = 22\n")
+        watcher.check()
+        store,added,removed,changed = changes.poll()
+        self.assertEqual(store.get('fooprogram.foo.change'), ['22'])
+        self.assertEqual(changes.poll(), None)
+        changes.close()
+        self.assertEqual(changes.poll(), None)
+
+    def test_check_subscriber_error(self):
+        "ConfigWatcher should notify every subscriber if one of them fails"
+        notifications = []
+        def broken(*args):
+            raise ValueError("broken subscriber")
+        watcher = ConfigWatcher(self.parser, use_inotify=False)
+        watcher.subscribe(broken)
+        watcher.subscribe(lambda *args: notifications.append(args))
+        watcher.check()
+        self.write("[foo]\nkeep = 1\nchange = 22\n")
+        self.assertTrue(watcher.check())
+        self.assertEqual(len(notifications), 1)
+        self.assertTrue(isinstance(watcher.error, ValueError))
+
+    def test_watch(self):
+        "ConfigWatcher should detect changes in the background"
+        notified = threading.Event()
+        watcher = ConfigWatcher(self.parser, interval=0.1)
+        watcher.subscribe(lambda *args: notified.set())
+        watcher.start()
+        try:
+            self.write("[foo]\nkeep = 1\nchange = 22\n")
+            notified.wait(5.0)
+            self.assertTrue(notified.is_set())
+        finally:
+            watcher.stop()
+
+    def test_watch_fragments(self):
+        "ConfigWatcher should poll the fragments if there is no configuration file"
+        directory = os.path.join(self.tmpdir, 'conf.d')
+        os.mkdir(directory)
+        parser = ConfigParser()
+        parser.set_directory(directory)
+        parser.add_section('foo', 'fooprogram.foo')
+        notified = threading.Event()
+        def callback(store, *args):
+            if store.get('fooprogram.foo.change') == ['22']:
+                notified.set()
+        watcher = ConfigWatcher(parser, interval=0.1)
+        watcher.subscribe(callback)
+        watcher.start()
+        try:
+            with open(os.path.join(directory, '00.conf'), 'w') as f:
+                f.write("[foo]\nchange = 22\n")
+            notified.wait(5.0)
+            self.assertTrue(notified.is_set())
+        finally:
+            watcher.stop()
+
+    def test_watch_invalid(self):
+        "ConfigWatcher should keep watching while the file is invalid"
+        notified = threading.Event()
+        def callback(store, *args):
+            if store.get('fooprogram.foo.change') == ['22']:
+                notified.set()
+        def broken(*args):
+            raise ValueError("broken subscriber")
+        watcher = ConfigWatcher(self.parser, interval=0.1)
+        watcher.subscribe(broken)
+        watcher.subscribe(callback)
+        watcher.start()
+        try:
+            self.replace("garbage without header\n")
+            for i in range(50):
+                if watcher.error is not None:
+                    break
+                time.sleep(0.1)
+            self.assertTrue(watcher.error is not None)
+            self.assertTrue(watcher._thread.is_alive())
+            self.assertEqual(watcher.store.get('fooprogram.foo.change'), ['2'])
+            self.replace("[foo]\nkeep = 1\nchange = 22\n")
+            notified.wait(5.0)
+            self.assertTrue(notified.is_set())
+            self.assertTrue(watcher._thread.is_alive())
+        finally:
+            watcher.stop()